@@ -0,0 +1,107 @@
+import asyncio, contextvars, os, queue, threading
+from dotenv import load_dotenv
+
+env_path = 'knowledgegraph/neo4j_creds.env'
+load_dotenv(dotenv_path=env_path)
+
+# Event stream of a question as it is being answered, so a caller can show the Cypher and the rows
+# the moment run_query has them and the answer token by token instead of waiting for the whole
+# completion. The pipelines call emit() at each step; with no sink installed that is a no-op and
+# generate_response_from_kg_results makes one blocking LLM call as before. With a sink (event_sink,
+# or stream_events/stream_events_async behind stream_prompt and stream_prompt_async) the answer is
+# requested with stream=True and every text delta is emitted as it arrives. Events are dicts:
+#
+#   {"type": "query", "query": ..., "source": "template" | "cache" | "generated"}
+#   {"type": "rejected", "query": ..., "feedback": ...}     validation rejected a candidate
+#   {"type": "rows", "query": ..., "rows": [...], "truncated": bool}
+#   {"type": "token", "text": ...}                          a piece of the answer
+#   {"type": "done", "answer": ..., "feasible": bool, ...}  always last
+#
+# The sink lives in a context variable, so asyncio tasks started by the pipeline (parallel Cypher
+# candidates) emit into the stream of the question that started them.
+
+answer_stream_config = {
+    "STREAM_ANSWERS": os.getenv("STREAM_ANSWERS", "true").lower() == "true",
+}
+
+_sink = contextvars.ContextVar("event_sink", default=None)
+
+
+class StreamClosed(Exception):
+    """Raised inside the pipeline when the consumer stopped reading, to abandon the question."""
+
+
+def streaming():
+    return _sink.get() is not None
+
+
+def emit(event_type, **fields):
+    sink = _sink.get()
+    if sink is not None:
+        sink({"type": event_type, **fields})
+
+
+class event_sink:
+    """Context manager installing sink(event) for the pipeline calls made inside it."""
+
+    def __init__(self, sink):
+        self.sink = sink
+
+    def __enter__(self):
+        self.token = _sink.set(self.sink)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _sink.reset(self.token)
+        return False
+
+
+def stream_events(run, done):
+    """Call run() on a worker thread and yield its events, then {"type": "done", **done(result)}."""
+    events = queue.Queue()
+    closed = threading.Event()
+
+    def sink(event):
+        if closed.is_set():
+            raise StreamClosed()
+        events.put(("event", event))
+
+    def work():
+        try:
+            with event_sink(sink):
+                events.put(("done", run()))
+        except BaseException as e:
+            events.put(("error", e))
+
+    threading.Thread(target=contextvars.copy_context().run, args=(work,), daemon=True).start()
+    try:
+        while True:
+            kind, value = events.get()
+            if kind == "event":
+                yield value
+            elif kind == "done":
+                yield {"type": "done", **done(value)}
+                return
+            else:
+                raise value
+    finally:
+        # A consumer that stops early makes the worker's next emit() raise StreamClosed.
+        closed.set()
+
+
+async def stream_events_async(make_coroutine, done):
+    """Async version of stream_events: runs make_coroutine() as a task on the current loop."""
+    events = asyncio.Queue()
+    with event_sink(events.put_nowait):
+        task = asyncio.ensure_future(make_coroutine())
+    task.add_done_callback(lambda finished: events.put_nowait(None))
+    try:
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            yield event
+        yield {"type": "done", **done(task.result())}
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,358 @@
+import asyncio, json, sys, time
+from main_project_code import (
+    neo4j_config, extract_cypher_code, llm_client_key,
+    sanity_check_messages, cypher_generation_messages, kg_response_messages,
+)
+from schema_cache import schema_cache
+from llm_clients import get_llm_client, acomplete, astream, aclose_llm_clients
+from cypher_validator import check_candidate_async, format_validation_errors
+from query_executor import execute_read_query_async
+from query_cache import cached_cypher, remember_cypher, cached_result, remember_result
+from index_manager import refresh_index_status_async
+from entity_linker import link_entities_async, annotate_prompt, local_sanity_check
+from intent_templates import answer_from_template_async, record_llm_path
+from tracing import traced, stage_span, current_span, record_llm_call, record_execution, start_metrics_server
+from answer_stream import emit, streaming, stream_events_async
+
+# Asyncio version of the process_prompt pipeline in main_project_code.py, on the async Neo4j
+# driver and the async LLM clients. One event loop can serve many questions at once, sharing
+# a single AsyncDriver, the schema cache and the pooled LLM clients.
+
+# First function in main: main -> process_prompt_async
+# Returns the final query, rows and answer plus per-stage timings in seconds; "feasible" is False
+# (and the other fields None) when the sanity check rejects the question.
+# "template" names the intent template when one answered the question without any LLM call.
+# num_candidates is the pass@k knob: each round asks the LLM for that many diverse candidates at
+# once and executes the valid ones in parallel. With selection="first" the first non-empty result
+# wins and the rest are cancelled (lowest latency); with "best" the round waits for every candidate
+# and keeps the result most candidates agree on. max_tries caps the total number of candidates,
+# so num_candidates=1 is the original sequential retry loop. max_tries and num_candidates below 1
+# raise ValueError: a round without candidates would never finish.
+selections = ("first", "best")
+
+@traced("process_prompt")
+async def process_prompt_async(driver, user_prompt, max_tries, model_name, num_candidates=1, selection="first"):
+    if max_tries < 1 or num_candidates < 1:
+        raise ValueError(f"max_tries and num_candidates must be at least 1, got {max_tries} and {num_candidates}")
+    if selection not in selections:
+        raise ValueError(f"selection must be one of {', '.join(selections)}, got {selection!r}")
+    started = time.perf_counter()
+    timings = {}
+    output = {"query": None, "rows": None, "answer": None, "feasible": False, "attempts": 0, "timings": timings}
+    schema = await timed(timings, "schema", fetch_entity_and_relationships_async(driver))
+    links = await timed(timings, "entity_linking", link_entities_async(driver, user_prompt, schema))
+    # Common question shapes are answered from a pre-validated template without any LLM call.
+    template = await timed(timings, "template", answer_from_template_async(driver, user_prompt, schema, links))
+    if template:
+        match, execution, answer = template
+        current_span().set("template", match["template"]["intent"])
+        emit("query", query=match["query"], source="template")
+        emit("rows", query=match["query"], rows=execution["rows"], truncated=execution["truncated"])
+        emit("token", text=answer)
+        timings["total"] = time.perf_counter() - started
+        output.update(
+            query=match["query"], rows=execution["rows"], answer=answer, feasible=True, template=match["template"]["intent"],
+            execution={key: value for key, value in execution.items() if key != "rows"},
+        )
+        return output
+    # A question already answered against this schema skips the sanity check and generation.
+    cached_query = cached_cypher(user_prompt, schema, model_name)
+    if cached_query:
+        emit("query", query=cached_query, source="cache")
+        execution = await timed(timings, "execution", run_query_async(cached_query, driver))
+        if execution["rows"]:
+            output["cache"] = "question"
+            return await finish(output, started, user_prompt, cached_query, execution, schema, model_name)
+    generation_prompt = annotate_prompt(user_prompt, links)
+    # The sanity check and the first round of Cypher generation only depend on the schema, so they
+    # run together; the generation is cancelled if the question turns out to be unsuitable. A
+    # prompt that clearly fits the graph skips the LLM sanity check altogether.
+    candidates = start_candidate_generation(
+        generation_prompt, schema, 1, "", model_name, min(num_candidates, max_tries), timings
+    )
+    if not local_sanity_check(user_prompt, schema, links):
+        sanity_check = asyncio.create_task(timed(timings, "sanity_check", query_sanity_check_async(schema, user_prompt, model_name)))
+        try:
+            feasible = (await sanity_check).lower() != "no"
+        except BaseException:
+            cancel_all(candidates)
+            raise
+        if not feasible:
+            current_span().set("feasible", False)
+            cancel_all(candidates)
+            timings["total"] = time.perf_counter() - started
+            return output
+
+    attempts = 0
+    invalid_query = ""
+    while True:
+        # Every round has at least one candidate, so attempts reaches max_tries.
+        attempts += len(candidates)
+        output["attempts"] = attempts
+        candidate_query, execution, tried_queries = await run_candidates(driver, candidates, schema, selection, timings)
+        results = execution["rows"] if execution else []
+        if results:
+            remember_cypher(user_prompt, schema, model_name, candidate_query)
+            break  # Exit the loop if results are found
+        for tried_query in tried_queries:
+            invalid_query = invalid_query + "\n\n" + tried_query
+        if attempts >= max_tries:
+            break
+        current_span().add("retries")
+        candidates = start_candidate_generation(
+            generation_prompt, schema, attempts + 1, invalid_query, model_name,
+            min(num_candidates, max_tries - attempts), timings,
+        )
+
+    output = await finish(output, started, user_prompt, candidate_query, execution, schema, model_name)
+    record_llm_path(timings["total"])
+    return output
+
+# Nested call: main -> process_prompt_async -> finish (answer synthesis and output record)
+async def finish(output, started, user_prompt, candidate_query, execution, schema, model_name):
+    timings = output["timings"]
+    results = execution["rows"] if execution else []
+    answer = await timed(timings, "answer", generate_response_from_kg_results_async(
+        user_prompt, candidate_query, results, schema, model_name, bool(execution and execution["truncated"])
+    ))
+    timings["total"] = time.perf_counter() - started
+    output.update(query=candidate_query, rows=results, answer=answer, feasible=True)
+    if execution:
+        output["execution"] = {key: value for key, value in execution.items() if key != "rows"}
+    return output
+
+# Extra instructions and temperatures that push parallel candidates towards different queries.
+candidate_variants = [
+    ("", None),
+    ("Variant: anchor the query on the named entities and follow the shortest relationship path from them.", 0.7),
+    ("Variant: use undirected relationship patterns, and look up names that may not be exact through the full-text index if one is listed.", 0.9),
+    ("Variant: consider multi-hop paths through intermediate entities (e.g. Country or Mine).", 1.0),
+]
+
+# Nested call: main -> process_prompt_async -> start_candidate_generation
+def start_candidate_generation(user_prompt, schema, run_number, invalid_query, model_name, count, timings):
+    tasks = []
+    for index in range(count):
+        messages = cypher_generation_messages(user_prompt, schema, run_number, invalid_query)
+        options = {}
+        if count > 1:
+            hint, temperature = candidate_variants[index % len(candidate_variants)]
+            if hint:
+                messages.append({"role": "system", "content": hint})
+            if temperature is not None:
+                options["temperature"] = temperature
+        tasks.append(asyncio.create_task(in_stage("generation", query_llm_async(model_name, messages, **options))))
+    time_round(timings, "generation", tasks)
+    return tasks
+
+# Nested call: main -> process_prompt_async -> run_candidates
+# Validates and executes each generated candidate as soon as it arrives. Returns (query, execution,
+# tried_queries), execution being the execute_read_query_async result or None; tried_queries holds the candidates that failed, with any validation or server errors, in
+# the form fed back to the next round. Connection and driver errors are raised: another query won't fix them.
+async def run_candidates(driver, generations, schema, selection, timings):
+    pending = set(generations)
+    executions = {}
+    tried_queries = []
+    successes = []
+    generation_errors = []
+    last_query = ""
+    done = set()
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task in executions:
+                    query = last_query = executions[task]
+                    if not task.exception() and isinstance(task.result(), str):
+                        tried_queries.append(query + task.result())  # Rejected by validation
+                        continue
+                    if task.exception():
+                        if is_driver_error(task.exception()):
+                            raise task.exception()
+                        tried_queries.append(query + "\nThis query failed on the server:\n" + repr(task.exception()))
+                        continue
+                    execution = task.result()
+                    if execution and execution["rows"]:
+                        successes.append((query, execution))
+                        if selection == "first":
+                            return query, execution, tried_queries
+                    else:
+                        tried_queries.append(query)
+                    continue
+                if task.exception():
+                    generation_errors.append(task.exception())
+                    if len(generation_errors) == len(generations):
+                        raise generation_errors[0]  # The LLM itself is failing, retrying won't help
+                    continue
+                candidate_query = last_query = extract_cypher_code(task.result())
+                if "error" in candidate_query.lower():
+                    tried_queries.append("")
+                elif candidate_query in executions.values():
+                    continue  # Another candidate already produced this exact query
+                else:
+                    emit("query", query=candidate_query, source="generated")
+                    execution = asyncio.create_task(validate_and_run_async(candidate_query, schema, driver, timings))
+                    executions[execution] = candidate_query
+                    pending.add(execution)
+    finally:
+        cancel_all(pending)
+        # Candidates that finished alongside an early winner are never looked at; mark their errors as seen.
+        for task in done:
+            if not task.cancelled():
+                task.exception()
+    if not successes:
+        return last_query, None, tried_queries
+    return most_agreed(successes) + (tried_queries,)
+
+# Returns the execution result, or the validation feedback string if the candidate was rejected before execution.
+async def validate_and_run_async(candidate_query, schema, driver, timings):
+    validation_errors = await timed(timings, "validation", check_candidate_async(candidate_query, schema, driver))
+    if validation_errors:
+        feedback = "\nThis query was rejected before execution:\n" + format_validation_errors(validation_errors)
+        emit("rejected", query=candidate_query, feedback=feedback.strip())
+        return feedback
+    return await timed(timings, "execution", run_query_async(candidate_query, driver))
+
+# Failures of the connection, session or credentials rather than of the query itself.
+def is_driver_error(error):
+    try:
+        from neo4j.exceptions import AuthError, DriverError
+    except ImportError:
+        return isinstance(error, OSError)
+    return isinstance(error, (AuthError, DriverError, OSError))
+
+# Picks the result returned by the most candidates; ties go to the candidate that finished first.
+def most_agreed(successes):
+    votes = {}
+    for query, execution in successes:
+        key = tuple(sorted(json.dumps(row, sort_keys=True, default=str) for row in execution["rows"]))
+        votes.setdefault(key, []).append((query, execution))
+    return max(votes.values(), key=len)[0]
+
+def cancel_all(tasks):
+    for task in tasks:
+        task.cancel()
+
+# Awaits a pipeline stage in its own tracing span and adds its wall time to timings[stage].
+async def timed(timings, stage, awaitable):
+    start = time.perf_counter()
+    try:
+        with stage_span(stage):
+            return await awaitable
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+# Runs a pipeline stage in its own tracing span without timing it; see time_round.
+async def in_stage(stage, awaitable):
+    with stage_span(stage):
+        return await awaitable
+
+# Adds the wall time until the last of tasks finishes (or is cancelled) to timings[stage] once, so
+# parallel candidates count for the round's duration rather than the sum of their overlapping times.
+def time_round(timings, stage, tasks):
+    start = time.perf_counter()
+    remaining = set(tasks)
+
+    def finished(task):
+        remaining.discard(task)
+        if not remaining:
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+    for task in tasks:
+        task.add_done_callback(finished)
+
+# Nested call: main -> process_prompt_async -> 1. fetch_entity_and_relationships_async
+@traced("fetch_entity_and_relationships")
+async def fetch_entity_and_relationships_async(driver, refresh=False):
+    schema = await schema_cache.get_async(driver, refresh=refresh)
+    current_span().set("schema_rows", len(schema))
+    return schema
+
+# Nested call: main -> process_prompt_async -> run_query_async (to execute output query)
+# Read transaction with timeout and row/byte budget; returns rows plus truncation info and server
+# timings. Results are cached per normalized query until the graph version changes.
+@traced("run_query")
+async def run_query_async(query, driver):
+    execution = cached_result(query)
+    cache_hit = execution is not None
+    if not cache_hit:
+        execution = await execute_read_query_async(driver, query)
+        remember_result(query, execution)
+    record_execution(execution, cache_hit)
+    emit("rows", query=query, rows=execution["rows"], truncated=execution["truncated"])
+    return execution
+
+# Nested call: main -> process_prompt_async -> 2. query_sanity_check_async
+async def query_sanity_check_async(schema, user_prompt, model_name):
+    return await query_llm_async(model_name, sanity_check_messages(schema, user_prompt))
+
+# Nested call: main -> process_prompt_async -> 2. generate_cypher_query_from_prompt_async
+async def generate_cypher_query_from_prompt_async(prompt, schema, run_number, invalid_query, model_name):
+    return await query_llm_async(model_name, cypher_generation_messages(prompt, schema, run_number, invalid_query))
+
+# Nested call: main -> process_prompt_async -> generate_response_from_kg_results_async
+# Streamed token by token when an answer_stream.py sink is listening
+async def generate_response_from_kg_results_async(user_prompt, candidate_query, results, schema, model_name, truncated=False):
+    messages = kg_response_messages(user_prompt, candidate_query, results, schema, truncated)
+    if streaming():
+        return await stream_llm_async(model_name, messages)
+    return await query_llm_async(model_name, messages)
+
+@traced("query_llm")
+async def query_llm_async(model_name, messages, **options):
+    output = await acomplete(get_llm_client(llm_client_key(model_name)), messages, **options)
+    record_llm_call(model_name, messages, output)
+    return output
+
+@traced("query_llm")
+async def stream_llm_async(model_name, messages, **options):
+    parts = []
+    async for text in astream(get_llm_client(llm_client_key(model_name)), messages, **options):
+        parts.append(text)
+        emit("token", text=text)
+    output = "".join(parts).strip()
+    record_llm_call(model_name, messages, output)
+    return output
+
+# Async iterator form of process_prompt_async: yields the answer_stream.py events as the question is
+# answered and finally {"type": "done", ...} with the process_prompt_async output minus the rows
+# (already sent in a "rows" event).
+def stream_prompt_async(driver, user_prompt, max_tries, model_name, num_candidates=1, selection="first"):
+    return stream_events_async(
+        lambda: process_prompt_async(driver, user_prompt, max_tries, model_name, num_candidates, selection),
+        lambda output: {key: value for key, value in output.items() if key != "rows"},
+    )
+
+# Answers several questions concurrently on one driver; results come back in input order.
+async def process_prompts_async(driver, user_prompts, max_tries, model_name, num_candidates=1, selection="first"):
+    return await asyncio.gather(
+        *(process_prompt_async(driver, user_prompt, max_tries, model_name, num_candidates, selection) for user_prompt in user_prompts),
+        return_exceptions=True,
+    )
+
+# Reads one question per line from stdin and answers them all on a single event loop.
+async def main_async():
+    from neo4j import AsyncGraphDatabase
+    driver = AsyncGraphDatabase.driver(neo4j_config["NEO4J_URI"], auth=(neo4j_config["NEO4J_USERNAME"], neo4j_config["NEO4J_PASSWORD"]))
+    max_tries = 10
+    model_name = 'gpt-35'
+    start_metrics_server()
+    try:
+        await refresh_index_status_async(driver)
+        user_prompts = [line.strip() for line in sys.stdin if line.strip()]
+        outputs = await process_prompts_async(driver, user_prompts, max_tries, model_name)
+        for user_prompt, output in zip(user_prompts, outputs):
+            print(f"\nQuestion: {user_prompt}")
+            if isinstance(output, BaseException):
+                print(f"Failed: {output!r}")
+            elif not output["feasible"]:
+                print("Query not suitable. Please try again with a different query.")
+            else:
+                print("Generated Cypher Query:\n", output["query"])
+                print(output["answer"])
+    finally:
+        await driver.close()
+        await aclose_llm_clients()
+
+if __name__ == '__main__':
+    asyncio.run(main_async())
@@ -0,0 +1,125 @@
+import argparse, asyncio, json, sys, time
+from main_project_code import neo4j_config
+from async_pipeline import process_prompt_async, fetch_entity_and_relationships_async
+from llm_clients import aclose_llm_clients
+from index_manager import refresh_index_status_async
+from intent_templates import template_stats
+from tracing import start_metrics_server
+
+# Batch question mode: answers every question in a JSONL file ({"question": ...} per line, with an
+# optional "id") through the async pipeline, with at most --concurrency questions in flight on one
+# shared driver and warm schema. A JSONL result line is written as soon as each question finishes,
+# and a throughput / latency-percentile summary is printed to stderr at the end. A line that isn't
+# valid JSON or has no question is written back with an "error" and counted as failed.
+
+def read_questions(path):
+    with open(path) as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                yield {"id": line_number, "invalid": f"line {line_number} is not valid JSON: {e}"}
+                continue
+            if isinstance(item, str):
+                item = {"question": item}
+            if not isinstance(item, dict):
+                yield {"id": line_number, "invalid": f"line {line_number} is not a JSON object or string"}
+                continue
+            item.setdefault("id", line_number)
+            yield item
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return None
+    rank = max(1, -(-len(values) * pct // 100))
+    return values[rank - 1]
+
+def summarize(latencies, failures, rejected, wall_time):
+    """latencies holds the answered questions only; failed ones count in "failed" but not in latency or throughput."""
+    latencies = sorted(latencies)
+    completed = len(latencies)
+    return {
+        "answered": completed,
+        "failed": failures,
+        "rejected": rejected,
+        "wall_time_s": round(wall_time, 3),
+        "throughput_qps": round(completed / wall_time, 3) if wall_time else None,
+        "latency_s": {
+            "mean": round(sum(latencies) / completed, 3) if completed else None,
+            **{f"p{pct}": round(percentile(latencies, pct), 3) if completed else None for pct in (50, 90, 95, 99)},
+            "max": round(latencies[-1], 3) if completed else None,
+        },
+    }
+
+async def run_batch(driver, questions, out, concurrency, max_tries, model_name, num_candidates=1, selection="first"):
+    # Warm the schema once so the workers don't all introspect the graph at the same time.
+    await fetch_entity_and_relationships_async(driver)
+    latencies = []
+    failures = 0
+    rejected = 0
+    started = time.perf_counter()
+
+    async def worker():
+        nonlocal failures, rejected
+        # All workers pull from the same iterator; the event loop is single-threaded so no lock is needed.
+        for item in questions:
+            question_started = time.perf_counter()
+            record = {"id": item.get("id"), "question": item.get("question")}
+            try:
+                if "invalid" in item:
+                    raise ValueError(item["invalid"])
+                if not isinstance(item.get("question"), str) or not item["question"].strip():
+                    raise ValueError(f"item {item.get('id')} has no 'question'")
+                output = await process_prompt_async(driver, item["question"], max_tries, model_name, num_candidates, selection)
+                record.update(output)
+                rejected += not output["feasible"]
+            except Exception as e:
+                failures += 1
+                record["error"] = repr(e)
+            record["latency_s"] = time.perf_counter() - question_started
+            if "error" not in record:
+                latencies.append(record["latency_s"])
+            out.write(json.dumps(record, default=str) + "\n")
+            out.flush()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    summary = summarize(latencies, failures, rejected, time.perf_counter() - started)
+    summary["templates"] = template_stats()
+    return summary
+
+async def main_async(args):
+    from neo4j import AsyncGraphDatabase
+    driver = AsyncGraphDatabase.driver(neo4j_config["NEO4J_URI"], auth=(neo4j_config["NEO4J_USERNAME"], neo4j_config["NEO4J_PASSWORD"]))
+    out = open(args.output, "w") if args.output else sys.stdout
+    start_metrics_server()
+    try:
+        await refresh_index_status_async(driver)
+        summary = await run_batch(
+            driver, read_questions(args.questions), out, args.concurrency, args.max_tries, args.model,
+            args.candidates, args.selection,
+        )
+        print(json.dumps(summary, indent=2), file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        await driver.close()
+        await aclose_llm_clients()
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions against the knowledge graph.")
+    parser.add_argument("questions", help='JSONL file with one {"question": ...} object per line')
+    parser.add_argument("--output", help="write JSONL results here instead of stdout")
+    parser.add_argument("--concurrency", type=int, default=4, help="questions in flight at once")
+    parser.add_argument("--max-tries", type=int, default=10)
+    parser.add_argument("--model", default="gpt-35")
+    parser.add_argument("--candidates", type=int, default=1,
+                        help="Cypher candidates generated and executed in parallel per round (pass@k)")
+    parser.add_argument("--selection", choices=["first", "best"], default="first",
+                        help="first: take the first non-empty result; best: wait for all and take the majority result")
+    asyncio.run(main_async(parser.parse_args()))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,610 @@
+import argparse, asyncio, json, os, re, resource, sys, tempfile, time, tracemalloc, zlib
+from dotenv import load_dotenv
+from synthetic_graph import entity_names, synthetic_nodes, synthetic_edges, write_jsonl, mine_name
+from schema_cache import (
+    schema_cache, LABELS_QUERY, RELATIONSHIP_TYPES_QUERY, NODE_PROPERTIES_QUERY, RELATIONSHIP_PROPERTIES_QUERY,
+)
+from entity_linker import NAMES_QUERY
+from graph_version import graph_version_config, bump_graph_version
+from llm_clients import register_backend, llm_client_config, llm_clients
+from query_cache import query_cache_config, normalize_question
+from intent_templates import intent_templates_config
+from async_pipeline import process_prompt_async
+from batch_runner import summarize, percentile
+
+env_path = 'knowledgegraph/neo4j_creds.env'
+load_dotenv(dotenv_path=env_path)
+
+# Offline benchmark for the question pipeline. A deterministic fake LLM backend (registered through
+# llm_clients.register_backend) answers the sanity check, returns scripted Cypher for the benchmark
+# questions after a configurable latency, and can fail a share of first attempts to exercise the
+# retry loop. Queries run against MemoryGraph, an in-process stand-in for the driver that executes
+# the query shapes the pipeline and the scripts use, or against a real Neo4j with --backend neo4j
+# (the synthetic graph is then loaded through bulk_loader.py and tagged dataset=benchmark). For each
+# graph size the report has the cold-start cost, end-to-end and per-stage latency percentiles,
+# throughput and memory; --baseline compares against an earlier report and exits non-zero on
+# regressions beyond --tolerance.
+#
+#   python benchmark.py --companies 1000 100000 1000000 --questions 200 --output bench.json
+#   python benchmark.py --companies 1000 100000 --baseline bench.json
+
+
+class Record(dict):
+    def data(self):
+        return dict(self)
+
+
+class Summary:
+    def __init__(self, available_after, consumed_after):
+        self.result_available_after = available_after
+        self.result_consumed_after = consumed_after
+
+
+class MemoryGraphError(Exception):
+    pass
+
+
+NODE_PATTERN = re.compile(r"""\(\s*(\w*)\s*(?::\s*`?(\w+)`?)?\s*(?:\{\s*name\s*:\s*('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|\$\w+)\s*\})?\s*\)""")
+RELATIONSHIP_PATTERN = re.compile(r"\s*(<?)-\[\s*\w*\s*:\s*`?(\w+)`?\s*\]-(>?)\s*")
+READ_QUERY_PATTERN = re.compile(
+    r"^\s*MATCH\s+(?P<pattern>.+?)(?:\s+WHERE\s+(?P<where>.+?))?\s+RETURN\s+(?P<distinct>DISTINCT\s+)?(?P<returns>.+?)"
+    r"(?:\s+ORDER\s+BY\s+(?P<order>.+?))?(?:\s+LIMIT\s+(?P<limit>\d+))?\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+CONDITION_PATTERN = re.compile(r"^\s*(\w+)\.name\s*(=|STARTS\s+WITH)\s*('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|\$\w+)\s*$", re.IGNORECASE)
+RETURN_PATTERN = re.compile(r"^\s*(\w+)\.name(?:\s+AS\s+(\w+))?\s*$", re.IGNORECASE)
+ENDPOINT_COUNT_PATTERN = re.compile(r"^MATCH \((?::`(\w+)`)?\)-\[:`(\w+)`\]->\((?::`(\w+)`)?\) RETURN (count\(\*\) AS count|true AS exists LIMIT 1)$")
+
+
+class MemoryGraph:
+    """Nodes keyed by (label, name) with typed adjacency lists; answers catalog, schema, count-store and single-path read queries."""
+
+    def __init__(self):
+        self.labels = []  # node id -> label
+        self.names = []  # node id -> name
+        self.properties = []  # node id -> other properties
+        self.by_label = {}
+        self.by_name = {}
+        self.outgoing = {}  # (node id, type) -> [node id]
+        self.incoming = {}
+        self.type_endpoints = {}  # type -> {(start label, end label)}
+        self.type_keys = {}  # type -> relationship property keys
+        self.relationships = 0
+
+    def add_node(self, row):
+        key = (row["label"], row["name"])
+        if key in self.by_name:
+            return
+        node = len(self.labels)
+        self.labels.append(row["label"])
+        self.names.append(row["name"])
+        self.properties.append({key: value for key, value in row.items() if key not in ("label", "name")} or None)
+        self.by_label.setdefault(row["label"], []).append(node)
+        self.by_name[key] = node
+
+    def add_edge(self, row):
+        start = self.by_name[(row["start_label"], row["start"])]
+        end = self.by_name[(row["end_label"], row["end"])]
+        self.outgoing.setdefault((start, row["type"]), []).append(end)
+        self.incoming.setdefault((end, row["type"]), []).append(start)
+        self.type_endpoints.setdefault(row["type"], set()).add((row["start_label"], row["end_label"]))
+        self.type_keys.setdefault(row["type"], set()).update(row.get("properties") or ())
+        self.relationships += 1
+
+    def run(self, query, params):
+        text = query.strip()
+        if text.upper().startswith("EXPLAIN") or text.upper().startswith("SHOW"):
+            return []
+        if text == LABELS_QUERY:
+            return [{"label": label} for label in sorted(self.by_label)]
+        if text == RELATIONSHIP_TYPES_QUERY:
+            return [{"relationshipType": rel_type} for rel_type in sorted(self.type_endpoints)]
+        if text == NAMES_QUERY:
+            return [{"labels": [label], "name": name} for label, name in zip(self.labels, self.names)]
+        if text == NODE_PROPERTIES_QUERY:
+            rows = []
+            for label, nodes in sorted(self.by_label.items()):
+                keys = {"name"}
+                for node in nodes:
+                    keys.update(self.properties[node] or ())
+                rows.extend({"nodeLabels": [label], "propertyName": key} for key in sorted(keys))
+            return rows
+        if text == RELATIONSHIP_PROPERTIES_QUERY:
+            return [
+                {"relType": f":`{rel_type}`", "propertyName": key}
+                for rel_type in sorted(self.type_keys) for key in sorted(self.type_keys[rel_type]) or [None]
+            ]
+        endpoints = ENDPOINT_COUNT_PATTERN.match(text)
+        if endpoints:
+            start_label, rel_type, end_label, returns = endpoints.groups()
+            count = sum(
+                len(self.outgoing.get((node, rel_type), ())) if not end_label
+                else sum(1 for end in self.outgoing.get((node, rel_type), ()) if self.labels[end] == end_label)
+                for node in (self.by_label.get(start_label, []) if start_label else range(len(self.labels)))
+            )
+            if returns.startswith("count"):
+                return [{"count": count}]
+            return [{"exists": True}] if count else []
+        return self.read(text, params)
+
+    def read(self, query, params):
+        match = READ_QUERY_PATTERN.match(query)
+        if not match:
+            raise MemoryGraphError(f"MemoryGraph can't run: {query}")
+        nodes, relationships = self.parse_path(match.group("pattern"), params)
+        conditions = self.parse_conditions(match.group("where"), params)
+        returns = []
+        for item in match.group("returns").split(","):
+            returned = RETURN_PATTERN.match(item)
+            if not returned:
+                raise MemoryGraphError(f"MemoryGraph only returns <var>.name: {item}")
+            returns.append((returned.group(1), returned.group(2) or f"{returned.group(1)}.name"))
+
+        rows = []
+        seen = set()
+        for binding in self.bindings(nodes, relationships):
+            if conditions and not any(test(self.names[binding[var]]) for var, test in conditions):
+                continue
+            row = tuple(self.names[binding[var]] for var, alias in returns)
+            if match.group("distinct"):
+                if row in seen:
+                    continue
+                seen.add(row)
+            rows.append(row)
+        if match.group("order"):
+            rows.sort()
+        if match.group("limit"):
+            rows = rows[:int(match.group("limit"))]
+        return [dict(zip([alias for var, alias in returns], row)) for row in rows]
+
+    def parse_path(self, pattern, params):
+        nodes, relationships, position = [], [], 0
+        while True:
+            node = NODE_PATTERN.match(pattern, position)
+            if not node:
+                raise MemoryGraphError(f"MemoryGraph can't parse pattern: {pattern}")
+            var, label, value = node.groups()
+            nodes.append((var or f"_{len(nodes)}", label, literal(value, params) if value else None))
+            position = node.end()
+            if position >= len(pattern.rstrip()):
+                return nodes, relationships
+            relationship = RELATIONSHIP_PATTERN.match(pattern, position)
+            if not relationship:
+                raise MemoryGraphError(f"MemoryGraph can't parse pattern: {pattern}")
+            left, rel_type, right = relationship.groups()
+            relationships.append((rel_type, "out" if right else "in" if left else "both"))
+            position = relationship.end()
+
+    def parse_conditions(self, where, params):
+        if not where:
+            return []
+        conditions = []
+        for part in re.split(r"\s+OR\s+", where, flags=re.IGNORECASE):
+            condition = CONDITION_PATTERN.match(part)
+            if not condition:
+                raise MemoryGraphError(f"MemoryGraph can't evaluate WHERE {where}")
+            var, operator, value = condition.groups()
+            value = literal(value, params)
+            if operator == "=":
+                conditions.append((var, lambda name, value=value: name == value))
+            else:
+                conditions.append((var, lambda name, value=value: name.startswith(value)))
+        return conditions
+
+    def candidates(self, label, value):
+        if value is not None:
+            node = self.by_name.get((label, value)) if label else None
+            return [node] if node is not None else []
+        return self.by_label.get(label, []) if label else range(len(self.labels))
+
+    def neighbours(self, node, rel_type, direction):
+        if direction in ("out", "both"):
+            yield from self.outgoing.get((node, rel_type), ())
+        if direction in ("in", "both"):
+            yield from self.incoming.get((node, rel_type), ())
+
+    def bindings(self, nodes, relationships):
+        # Start from the first node pinned by name (an index seek) and expand outwards from it.
+        anchor = next((index for index, node in enumerate(nodes) if node[2] is not None), 0)
+        var, label, value = nodes[anchor]
+        partial = [{var: node} for node in self.candidates(label, value)]
+        flip = {"out": "in", "in": "out", "both": "both"}
+        steps = [(index, index + 1, relationships[index][1]) for index in range(anchor, len(relationships))]
+        steps += [(index + 1, index, flip[relationships[index][1]]) for index in range(anchor - 1, -1, -1)]
+        for source, target, direction in steps:
+            rel_type = relationships[min(source, target)][0]
+            source_var = nodes[source][0]
+            target_var, target_label, target_value = nodes[target]
+            extended = []
+            for binding in partial:
+                for node in self.neighbours(binding[source_var], rel_type, direction):
+                    if target_label and self.labels[node] != target_label:
+                        continue
+                    if target_value is not None and self.names[node] != target_value:
+                        continue
+                    extended.append({**binding, target_var: node})
+            partial = extended
+        return partial
+
+
+def literal(value, params):
+    if value.startswith("$"):
+        return params[value[1:]]
+    return value[1:-1].replace("\\'", "'").replace('\\"', '"')
+
+
+class MemoryResult:
+    def __init__(self, rows, available_after):
+        self.rows = rows
+        self.summary = Summary(available_after, 0)
+
+    def __iter__(self):
+        return (Record(row) for row in self.rows)
+
+    def __aiter__(self):
+        async def records():
+            for row in self.rows:
+                yield Record(row)
+        return records()
+
+    def single(self):
+        return Record(self.rows[0]) if self.rows else None
+
+    def data(self):
+        return list(self.rows)
+
+
+class AsyncMemoryResult(MemoryResult):
+    async def consume(self):
+        return self.summary
+
+
+class SyncMemoryResult(MemoryResult):
+    def consume(self):
+        return self.summary
+
+
+def run_memory_query(graph, query, parameters, kwargs, result_class):
+    started = time.perf_counter()
+    rows = graph.run(query, {**(parameters or {}), **kwargs})
+    return result_class(rows, round((time.perf_counter() - started) * 1000))
+
+
+class MemorySession:
+    """The subset of a neo4j Session used by this project, over a MemoryGraph."""
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query, parameters=None, **kwargs):
+        return run_memory_query(self.graph, query, parameters, kwargs, SyncMemoryResult)
+
+    def begin_transaction(self, timeout=None):
+        return self
+
+    def execute_read(self, work):
+        return work(self)
+
+    execute_write = execute_read
+
+    def close(self):
+        pass
+
+
+class AsyncMemorySession:
+    def __init__(self, graph, latency):
+        self.graph = graph
+        self.latency = latency
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def run(self, query, parameters=None, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return run_memory_query(self.graph, query, parameters, kwargs, AsyncMemoryResult)
+
+    async def begin_transaction(self, timeout=None):
+        return self
+
+    async def close(self):
+        pass
+
+
+class MemoryDriver:
+    def __init__(self, graph):
+        self.graph = graph
+
+    def session(self, **config):
+        return MemorySession(self.graph)
+
+    def close(self):
+        pass
+
+
+class AsyncMemoryDriver:
+    """Async driver stand-in; latency (seconds) is added to every query as a simulated network round trip."""
+
+    def __init__(self, graph, latency=0.0):
+        self.graph = graph
+        self.latency = latency
+
+    def session(self, **config):
+        return AsyncMemorySession(self.graph, self.latency)
+
+    async def close(self):
+        pass
+
+
+def stable_fraction(text):
+    return zlib.crc32(text.encode()) / 0xFFFFFFFF
+
+
+GENERATION_PROMPT = re.compile(r"Generate a Cypher query for this user prompt: (.*?)\. If run number =1", re.DOTALL)
+RUN_NUMBER = re.compile(r"If (\d+) > 1")
+
+
+class FakeLLMBackend:
+    """Deterministic stand-in for the LLM: scripted Cypher per question, fixed latency plus hash-based jitter."""
+
+    def __init__(self, script, latency=0.2, jitter=0.0, retry_rate=0.0):
+        self.script = script  # normalized question -> Cypher
+        self.latency = latency
+        self.jitter = jitter
+        self.retry_rate = retry_rate
+        self.calls = {"sanity_check": 0, "generation": 0, "answer": 0}
+
+    def respond(self, messages):
+        content = messages[-1]["content"]
+        if content.startswith("Here is the user prompt"):
+            self.calls["sanity_check"] += 1
+            return "Yes"
+        generation = GENERATION_PROMPT.search(content)
+        if generation:
+            self.calls["generation"] += 1
+            question = generation.group(1).split("\n(Entities")[0]
+            run_number = int(RUN_NUMBER.search(content).group(1))
+            if run_number == 1 and stable_fraction(question) < self.retry_rate:
+                return "```cypher\nMATCH (x:UnknownLabel) RETURN x.name AS name\n```"
+            return "```cypher\n" + self.script.get(normalize_question(question), "MATCH (c:Company) RETURN c.name AS company LIMIT 5") + "\n```"
+        self.calls["answer"] += 1
+        return "Answer synthesized from the query results."
+
+    def delay(self, messages):
+        return self.latency + self.jitter * stable_fraction(messages[-1]["content"])
+
+    def complete(self, messages, **options):
+        time.sleep(self.delay(messages))
+        return self.respond(messages)
+
+    async def acomplete(self, messages, **options):
+        await asyncio.sleep(self.delay(messages))
+        return self.respond(messages)
+
+
+def benchmark_questions(companies, count, seed=0):
+    """(question, scripted Cypher) pairs over the synthetic graph, cycling through the common question shapes."""
+    import random
+    rng = random.Random(seed)
+    entities = entity_names(companies)
+    shapes = [
+        lambda m: (f"Which companies are impacted by {m}?",
+                   f"MATCH (c:Company)-[:IMPACTED_BY]->(r:RawMaterials {{name: '{m}'}}) RETURN DISTINCT c.name AS company"),
+        lambda m: (f"Who supplies {m}?",
+                   f"MATCH (c:Company)-[:SUPPLIES]->(r:RawMaterials {{name: '{m}'}}) RETURN DISTINCT c.name AS supplier"),
+        lambda m: (f"Which countries possess mines for {m}?",
+                   f"MATCH (k:Country)-[:POSSESSED_BY]->(m:Mine {{name: '{mine_name(m)}'}}) RETURN DISTINCT k.name AS country"),
+        lambda s: (f"Which companies are in the {s} sector?",
+                   f"MATCH (s:Sector {{name: '{s}'}})-[:HAS_COMPANY]->(c:Company) RETURN DISTINCT c.name AS company"),
+        lambda c: (f"Which countries does {c} source from?",
+                   f"MATCH (c:Company {{name: '{c}'}})-[:SOURCES_FROM]->(k:Country) RETURN DISTINCT k.name AS country"),
+        lambda s: (f"What raw materials affect companies in the {s} sector?",
+                   f"MATCH (s:Sector {{name: '{s}'}})-[:HAS_COMPANY]->(c:Company)-[:IMPACTED_BY]->(r:RawMaterials) RETURN DISTINCT r.name AS material"),
+    ]
+    pools = ["RawMaterials", "RawMaterials", "RawMaterials", "Sector", "Company", "Sector"]
+    return [shapes[index % len(shapes)](rng.choice(entities[pools[index % len(shapes)]])) for index in range(count)]
+
+
+def stage_stats(outputs):
+    stages = {}
+    for output in outputs:
+        for stage, seconds in output["timings"].items():
+            stages.setdefault(stage, []).append(seconds)
+    return {
+        stage: {
+            "count": len(values),
+            "mean": round(sum(values) / len(values), 4),
+            "p50": round(percentile(sorted(values), 50), 4),
+            "p95": round(percentile(sorted(values), 95), 4),
+        }
+        for stage, values in sorted(stages.items())
+    }
+
+
+def load_memory_graph(companies, seed):
+    graph = MemoryGraph()
+    for row in synthetic_nodes(companies, seed):
+        graph.add_node(row)
+    for row in synthetic_edges(companies, seed):
+        graph.add_edge(row)
+    return graph, len(graph.labels), graph.relationships
+
+
+def load_neo4j_graph(companies, seed):
+    from neo4j import GraphDatabase
+    from bulk_loader import load_dataset
+    from graph_reset import reset_graph
+    from index_manager import ensure_indexes
+    driver = GraphDatabase.driver(os.getenv("NEO4J_URI"), auth=(os.getenv("NEO4J_USERNAME"), os.getenv("NEO4J_PASSWORD")))
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            nodes_path, edges_path = os.path.join(directory, "nodes.jsonl"), os.path.join(directory, "edges.jsonl")
+            nodes = write_jsonl(synthetic_nodes(companies, seed), nodes_path)
+            edges = write_jsonl(synthetic_edges(companies, seed), edges_path)
+            reset_graph(driver, dataset="benchmark")
+            load_dataset(driver, [nodes_path], [edges_path], dataset="benchmark")
+        ensure_indexes(driver)
+    finally:
+        driver.close()
+    return None, nodes, edges
+
+
+async def run_questions(driver, questions, concurrency, max_tries, model_name):
+    outputs, failures = [], 0
+    items = iter(questions)
+
+    async def worker():
+        nonlocal failures
+        for question in items:
+            try:
+                outputs.append(await process_prompt_async(driver, question, max_tries, model_name))
+            except Exception as e:
+                failures += 1
+                print(f"Failed: {question!r}: {e!r}", file=sys.stderr)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return outputs, failures
+
+
+async def benchmark_size(companies, args, backend):
+    report = {"companies": companies}
+    if args.trace_memory:
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    if args.backend == "memory":
+        graph, report["nodes"], report["relationships"] = load_memory_graph(companies, args.seed)
+        driver = AsyncMemoryDriver(graph, args.db_latency)
+    else:
+        from neo4j import AsyncGraphDatabase
+        graph, report["nodes"], report["relationships"] = load_neo4j_graph(companies, args.seed)
+        driver = AsyncGraphDatabase.driver(os.getenv("NEO4J_URI"), auth=(os.getenv("NEO4J_USERNAME"), os.getenv("NEO4J_PASSWORD")))
+    report["load_s"] = round(time.perf_counter() - started, 3)
+    if args.trace_memory:
+        report["graph_bytes"] = tracemalloc.get_traced_memory()[0] - before
+
+    questions = benchmark_questions(companies, args.questions, args.seed)
+    backend.script = {normalize_question(question): cypher for question, cypher in questions}
+    # A new graph: every cache keyed on the graph version starts cold.
+    bump_graph_version()
+    for kind in backend.calls:
+        backend.calls[kind] = 0
+    try:
+        # The first question pays for schema introspection and the entity index build.
+        started = time.perf_counter()
+        await process_prompt_async(driver, questions[0][0], args.max_tries, args.model)
+        report["cold_start_s"] = round(time.perf_counter() - started, 3)
+
+        if args.trace_memory:
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        outputs, failures = await run_questions(driver, [question for question, cypher in questions], args.concurrency, args.max_tries, args.model)
+        wall_time = time.perf_counter() - started
+    finally:
+        await driver.close()
+    report.update(summarize([output["timings"]["total"] for output in outputs], failures, 0, wall_time))
+    report["stages"] = stage_stats(outputs)
+    report["template_answers"] = sum(1 for output in outputs if output.get("template"))
+    report["attempts"] = sum(output["attempts"] for output in outputs)
+    report["llm_calls"] = dict(backend.calls)
+    if args.trace_memory:
+        report["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    report["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return report
+
+
+def compare(reports, baseline, tolerance):
+    """Regressions of this run against a baseline report, as human-readable lines."""
+    regressions = []
+    previous = {report["companies"]: report for report in baseline["sizes"]}
+    for report in reports:
+        old = previous.get(report["companies"])
+        if old is None:
+            continue
+        checks = [
+            ("latency p50", report["latency_s"]["p50"], old["latency_s"]["p50"], True),
+            ("latency p95", report["latency_s"]["p95"], old["latency_s"]["p95"], True),
+            ("cold start", report["cold_start_s"], old["cold_start_s"], True),
+            ("throughput", report["throughput_qps"], old["throughput_qps"], False),
+            ("peak memory", report.get("peak_bytes"), old.get("peak_bytes"), True),
+        ]
+        for name, new_value, old_value, higher_is_worse in checks:
+            if not new_value or not old_value:
+                continue
+            change = (new_value - old_value) / old_value
+            if (change if higher_is_worse else -change) > tolerance:
+                regressions.append(f"{report['companies']} companies: {name} {old_value} -> {new_value} ({change:+.0%})")
+    return regressions
+
+
+async def main_async(args):
+    version_dir = tempfile.mkdtemp(prefix="kg-benchmark-")
+    if args.backend == "memory":
+        # Keep the benchmark's graph versions away from the real graph's caches.
+        graph_version_config["GRAPH_VERSION_PATH"] = os.path.join(version_dir, "graph_version")
+    schema_cache.path = None
+    query_cache_config["QUERY_CACHE_ENABLED"] = args.cache
+    intent_templates_config["INTENT_TEMPLATES_ENABLED"] = not args.no_templates
+    backend = FakeLLMBackend({}, args.llm_latency, args.llm_jitter, args.retry_rate)
+    register_backend("benchmark", lambda config: backend)
+    llm_client_config["LLM_BACKEND"] = "benchmark"
+    llm_clients.close()
+
+    reports = []
+    for companies in args.companies:
+        report = await benchmark_size(companies, args, backend)
+        print(json.dumps(report), file=sys.stderr)
+        reports.append(report)
+    result = {
+        "backend": args.backend,
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "sizes": reports,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    else:
+        print(json.dumps(result, indent=2))
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(reports, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the question pipeline offline across graph sizes.")
+    parser.add_argument("--companies", type=int, nargs="+", default=[1000, 10000, 100000], help="graph sizes, in Company nodes")
+    parser.add_argument("--questions", type=int, default=100, help="questions per graph size")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--max-tries", type=int, default=3)
+    parser.add_argument("--model", default="gpt-35")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=["memory", "neo4j"], default="memory",
+                        help="memory: in-process graph; neo4j: load the synthetic graph into the configured Neo4j")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="simulated round trip per query on the memory backend (s)")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="fake LLM latency per call (s)")
+    parser.add_argument("--llm-jitter", type=float, default=0.0, help="extra deterministic per-call latency of up to this many seconds")
+    parser.add_argument("--retry-rate", type=float, default=0.0, help="share of questions whose first generated query is invalid")
+    parser.add_argument("--cache", action="store_true", help="keep the question and result caches on")
+    parser.add_argument("--no-templates", action="store_true", help="send every question through LLM generation")
+    parser.add_argument("--trace-memory", action="store_true", help="measure graph and peak Python memory with tracemalloc (slower)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative change counted as a regression")
+    sys.exit(asyncio.run(main_async(parser.parse_args())))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+import argparse, csv, json, os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from graph_version import bump_graph_version
+from schema_cache import quote_identifier
+
+env_path = 'knowledgegraph/neo4j_creds.env'
+load_dotenv(dotenv_path=env_path)
+
+# Bulk loader for the knowledge graph. Nodes and edges are read from CSV or JSONL files and written
+# with parameterized `UNWIND $rows` batches using MERGE, so loads are idempotent and never build a
+# giant Cypher string. Uniqueness constraints on the key property are created first so every
+# MERGE is an index seek.
+#
+# Node rows: {"label": "Company", "name": "Ola", ...other properties}
+# Edge rows: {"start_label": "Sector", "start": "Automotive", "type": "HAS_COMPANY",
+#             "end_label": "Company", "end": "Ola", ...other properties}
+#
+# Node batches run in parallel freely (the constraints serialize writers on the same key). Edge
+# batches lock both endpoints, so an edge batch first takes a lock per endpoint label. Partitions
+# over disjoint labels run in parallel and overlapping ones take turns, which avoids deadlocks.
+
+bulk_loader_config = {
+    "LOADER_BATCH_SIZE": int(os.getenv("LOADER_BATCH_SIZE", "5000")),
+    "LOADER_WORKERS": int(os.getenv("LOADER_WORKERS", "4")),
+}
+
+KEY_PROPERTY = "name"
+# Tags nodes with the dataset they came from (hidden from the LLM, see schema_cache.HIDDEN_PROPERTY_KEYS).
+DATASET_PROPERTY = "dataset"
+NODE_FIELDS = {"label", KEY_PROPERTY}
+EDGE_FIELDS = {"start_label", "start", "type", "end_label", "end"}
+
+CONSTRAINT_QUERY = "CREATE CONSTRAINT {name} IF NOT EXISTS FOR (n:{label}) REQUIRE n.{key} IS UNIQUE"
+NODE_BATCH_QUERY = '''
+UNWIND $rows AS row
+MERGE (n:{label} {{{key}: row.key}})
+SET n += row.properties
+'''
+EDGE_BATCH_QUERY = '''
+UNWIND $rows AS row
+MATCH (a:{start_label} {{{key}: row.start}})
+MATCH (b:{end_label} {{{key}: row.end}})
+MERGE (a)-[r:{rel_type}]->(b)
+SET r += row.properties
+'''
+
+
+def read_rows(path):
+    """Yield dict rows from a .csv or .jsonl file; empty CSV cells are dropped."""
+    with open(path, newline="") as f:
+        if path.endswith(".csv"):
+            for row in csv.DictReader(f):
+                yield {key: value for key, value in row.items() if value not in ("", None)}
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def constraint_name(label, key=KEY_PROPERTY):
+    return "".join(ch if ch.isalnum() else "_" for ch in f"{label}_{key}_unique")
+
+
+def create_constraints(driver, labels, key=KEY_PROPERTY):
+    """Create a uniqueness constraint on the key property for every label (no-op if it exists)."""
+    with driver.session() as session:
+        for label in sorted(labels):
+            session.run(CONSTRAINT_QUERY.format(
+                name=quote_identifier(constraint_name(label, key)), label=quote_identifier(label), key=quote_identifier(key)
+            )).consume()
+
+
+class Progress:
+    """Thread-safe row counter that prints rows/s as batches complete."""
+
+    def __init__(self, noun, verb="loaded", report_every=5.0):
+        self.noun = noun
+        self.verb = verb
+        self.report_every = report_every
+        self.rows = 0
+        self.started = time.perf_counter()
+        self._last_report = self.started
+        self._lock = threading.Lock()
+
+    def add(self, count):
+        with self._lock:
+            self.rows += count
+            now = time.perf_counter()
+            if now - self._last_report >= self.report_every:
+                self._last_report = now
+                print(f"  {self.rows} {self.noun} {self.verb} ({self.rate():.0f} rows/s)")
+
+    def rate(self):
+        elapsed = time.perf_counter() - self.started
+        return self.rows / elapsed if elapsed else 0.0
+
+    def summary(self):
+        return {"rows": self.rows, "seconds": round(time.perf_counter() - self.started, 3), "rows_per_second": round(self.rate(), 1)}
+
+
+class BatchWriter:
+    """Buffers rows per partition and hands full batches to a bounded thread pool."""
+
+    def __init__(self, driver, workers, batch_size, progress):
+        self.driver = driver
+        self.batch_size = batch_size
+        self.progress = progress
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.in_flight = threading.BoundedSemaphore(workers * 2)  # Caps buffered rows in memory
+        self.buffers = {}
+        self.futures = []
+
+    def add(self, partition, query, row, locks=()):
+        buffer = self.buffers.setdefault(partition, (query, locks, []))[2]
+        buffer.append(row)
+        if len(buffer) >= self.batch_size:
+            self.submit(partition)
+
+    def submit(self, partition):
+        query, locks, rows = self.buffers.pop(partition)
+        self.in_flight.acquire()
+        future = self.pool.submit(self.write, query, locks, rows)
+        future.add_done_callback(lambda _: self.in_flight.release())
+        self.futures.append(future)
+
+    def write(self, query, locks, rows):
+        for lock in locks:
+            lock.acquire()
+        try:
+            with self.driver.session() as session:
+                # Managed transactions are retried on transient errors such as lock timeouts.
+                session.execute_write(lambda tx: tx.run(query, rows=rows).consume())
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+        self.progress.add(len(rows))
+
+    def finish(self):
+        for partition in list(self.buffers):
+            self.submit(partition)
+        self.pool.shutdown(wait=True)
+        for future in self.futures:
+            future.result()  # Re-raise the first failed batch
+
+
+def load_nodes(driver, paths, batch_size, workers, dataset=None):
+    labels = set()
+    progress = Progress("nodes")
+    writer = BatchWriter(driver, workers, batch_size, progress)
+    queries = {}
+    constrained = set()
+    for path in paths:
+        for row in read_rows(path):
+            label = row["label"]
+            if label not in constrained:
+                create_constraints(driver, [label])
+                constrained.add(label)
+            labels.add(label)
+            properties = {key: value for key, value in row.items() if key not in NODE_FIELDS}
+            if dataset:
+                properties[DATASET_PROPERTY] = dataset
+            query = queries.setdefault(label, NODE_BATCH_QUERY.format(label=quote_identifier(label), key=quote_identifier(KEY_PROPERTY)))
+            writer.add(label, query, {"key": row[KEY_PROPERTY], "properties": properties})
+    writer.finish()
+    return labels, progress.summary()
+
+
+def load_edges(driver, paths, batch_size, workers):
+    progress = Progress("edges")
+    writer = BatchWriter(driver, workers, batch_size, progress)
+    label_locks = {}
+    queries = {}
+    for path in paths:
+        for row in read_rows(path):
+            partition = (row["start_label"], row["type"], row["end_label"])
+            if partition not in queries:
+                queries[partition] = EDGE_BATCH_QUERY.format(
+                    start_label=quote_identifier(row["start_label"]), end_label=quote_identifier(row["end_label"]),
+                    rel_type=quote_identifier(row["type"]), key=quote_identifier(KEY_PROPERTY),
+                )
+            # Locks are always taken in label order so two partitions can't wait on each other.
+            locks = tuple(label_locks.setdefault(label, threading.Lock()) for label in sorted({row["start_label"], row["end_label"]}))
+            properties = {key: value for key, value in row.items() if key not in EDGE_FIELDS}
+            writer.add(partition, queries[partition], {"start": row["start"], "end": row["end"], "properties": properties}, locks)
+    writer.finish()
+    return progress.summary()
+
+
+def load_dataset(driver, node_paths, edge_paths, batch_size=None, workers=None, dataset=None):
+    """Load node files, then edge files; returns per-phase row counts and rows/s."""
+    batch_size = batch_size or bulk_loader_config["LOADER_BATCH_SIZE"]
+    workers = workers or bulk_loader_config["LOADER_WORKERS"]
+    try:
+        labels, node_summary = load_nodes(driver, node_paths, batch_size, workers, dataset)
+        print(f"Nodes: {node_summary}")
+        edge_summary = load_edges(driver, edge_paths, batch_size, workers)
+        print(f"Edges: {edge_summary}")
+    finally:
+        # Even a partial load changed the graph.
+        bump_graph_version()
+    return {"labels": sorted(labels), "nodes": node_summary, "edges": edge_summary}
+
+
+def main():
+    from neo4j import GraphDatabase
+    parser = argparse.ArgumentParser(description="Load nodes and edges from CSV/JSONL files into Neo4j.")
+    parser.add_argument("--nodes", nargs="*", default=[], help="node files (.csv or .jsonl)")
+    parser.add_argument("--edges", nargs="*", default=[], help="edge files (.csv or .jsonl)")
+    parser.add_argument("--batch-size", type=int, default=bulk_loader_config["LOADER_BATCH_SIZE"])
+    parser.add_argument("--workers", type=int, default=bulk_loader_config["LOADER_WORKERS"])
+    parser.add_argument("--dataset", help="tag loaded nodes with this dataset name")
+    parser.add_argument("--skip-indexes", action="store_true", help="don't refresh the range and full-text name indexes after loading")
+    args = parser.parse_args()
+    driver = GraphDatabase.driver(os.getenv("NEO4J_URI"), auth=(os.getenv("NEO4J_USERNAME"), os.getenv("NEO4J_PASSWORD")))
+    try:
+        load_dataset(driver, args.nodes, args.edges, args.batch_size, args.workers, args.dataset)
+        if not args.skip_indexes:
+            from index_manager import ensure_indexes
+            ensure_indexes(driver)
+    finally:
+        driver.close()
+
+if __name__ == '__main__':
+    main()
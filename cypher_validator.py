@@ -0,0 +1,229 @@
+import difflib, os, re
+from dotenv import load_dotenv
+
+env_path = 'knowledgegraph/neo4j_creds.env'
+load_dotenv(dotenv_path=env_path)
+
+# Local pre-execution checks for LLM-generated Cypher. A candidate is tokenized and its labels,
+# relationship types and property keys are checked against the cached schema, and write clauses
+# are rejected outright, so a bad query is caught in microseconds instead of after a database
+# round trip. Errors are dicts ({"code", "message"}) and are fed back into the next generation
+# attempt via format_validation_errors. Set CYPHER_EXPLAIN=true to also have the server plan the
+# query with EXPLAIN (which does not execute it) before it is run.
+
+cypher_validation_config = {
+    "CYPHER_EXPLAIN": os.getenv("CYPHER_EXPLAIN", "false").lower() == "true",
+}
+
+WRITE_KEYWORDS = {"CREATE", "MERGE", "DELETE", "DETACH", "SET", "REMOVE", "DROP", "FOREACH", "LOAD"}
+WRITE_PROCEDURE_PREFIXES = (
+    "dbms.", "db.create", "db.clear", "db.index.fulltext.create", "db.index.fulltext.drop",
+    "apoc.create", "apoc.merge", "apoc.refactor", "apoc.periodic", "apoc.do", "apoc.cypher.do",
+    "apoc.nodes.delete", "apoc.trigger", "apoc.load", "apoc.import", "apoc.export",
+)
+# Keywords that can be followed directly by a pattern; any other identifier before "(" is a function call.
+PATTERN_KEYWORDS = {"MATCH", "MERGE", "CREATE", "WHERE", "AND", "OR", "XOR", "NOT", "EXISTS", "WITH", "RETURN", "IN"}
+# Words that can follow a variable; a write keyword is always followed by a name or a pattern instead.
+VARIABLE_FOLLOWERS = {"AS", "ASC", "ASCENDING", "DESC", "DESCENDING", "IN", "IS", "AND", "OR", "XOR", "STARTS", "ENDS", "CONTAINS"}
+
+TOKEN_PATTERN = re.compile(r'''
+    (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+  | (?P<quoted>`(?:[^`]|``)*`)
+  | (?P<parameter>\$\w+)
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<identifier>[A-Za-z_]\w*)
+  | (?P<range>\.\.)
+  | (?P<arrow><-|->)
+  | (?P<symbol>[^\s\w])
+''', re.VERBOSE | re.DOTALL)
+
+
+def tokenize(query):
+    """Split a Cypher query into (kind, text) tokens, dropping comments and unquoting `identifiers`."""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(query):
+        kind = match.lastgroup
+        text = match.group()
+        if kind == "comment":
+            continue
+        if kind == "quoted":
+            kind, text = "identifier", text[1:-1].replace("``", "`")
+        tokens.append((kind, text))
+    return tokens
+
+
+def schema_summary(schema):
+    """Reduce schema rows from fetch_entity_and_relationships to the sets the validator checks against.
+
+    property_keys holds the keys of nodes and of relationships, as both are reached through var.key.
+    """
+    labels, relationship_types, property_keys = set(), set(), set()
+    for row in schema:
+        labels.update(row.get("entityTypes") or ())
+        labels.update(row.get("relatedEntityTypes") or ())
+        property_keys.update(row.get("propertyKeys") or ())
+        property_keys.update(row.get("relationshipPropertyKeys") or ())
+        if row.get("relationshipType"):
+            relationship_types.add(row["relationshipType"])
+    return {"labels": labels, "relationship_types": relationship_types, "property_keys": property_keys}
+
+
+def referenced_names(tokens):
+    """Collect the labels, relationship types, property keys and write operations a query uses."""
+    labels, relationship_types, property_keys, writes = [], [], [], []
+    variables = set()  # Names bound in patterns or with AS, e.g. `RETURN c.name AS set`
+    stack = []  # Open brackets as (symbol, kind) with kind "pattern", "call", "map" or "literal"
+    previous = (None, None)
+    for index, (kind, text) in enumerate(tokens):
+        following = tokens[index + 1] if index + 1 < len(tokens) else (None, None)
+        inside = stack[-1] if stack else (None, None)
+        if kind == "symbol" and text in "([{":
+            if text == "(":
+                is_call = previous[0] == "identifier" and previous[1].upper() not in PATTERN_KEYWORDS
+                stack.append(("(", "call" if is_call else "pattern"))
+            elif text == "[":
+                stack.append(("[", "pattern"))
+            else:
+                is_pattern_map = inside[1] == "pattern" and (previous[0] == "identifier" or previous[1] == "(")
+                stack.append(("{", "map" if is_pattern_map else "literal"))
+        elif kind == "symbol" and text in ")]}":
+            if stack:
+                stack.pop()
+        elif kind == "symbol" and text == ":" and inside[0] != "{" and following[0] == "identifier":
+            names = labels if inside[0] != "[" else relationship_types
+            position = index + 1
+            expect_name = True
+            # Label / type expressions: A|B, A&B, A:B, !A
+            while position < len(tokens):
+                token_kind, token_text = tokens[position]
+                if expect_name and token_kind == "identifier":
+                    names.append(token_text)
+                    expect_name = False
+                elif expect_name and token_text == "!":
+                    pass
+                elif not expect_name and token_text in ("|", "&", ":"):
+                    expect_name = True
+                else:
+                    break
+                position += 1
+        elif kind == "identifier" and inside == ("{", "map") and following == ("symbol", ":"):
+            property_keys.append(text)
+        elif kind == "symbol" and text == "." and following[0] == "identifier":
+            if inside[0] == "{" and previous[1] in ("{", ","):
+                property_keys.append(following[1])  # Map projection: n {.name, .nationality}
+            elif previous[0] == "identifier":
+                position = index + 1
+                while position + 2 < len(tokens) and tokens[position + 1] == ("symbol", ".") and tokens[position + 2][0] == "identifier":
+                    position += 2
+                next_token = tokens[position + 1] if position + 1 < len(tokens) else (None, None)
+                if next_token != ("symbol", "("):  # a.b.c( is a namespaced function, not a property
+                    property_keys.append(following[1])
+        elif kind == "identifier" and previous[1] not in (".", ":") and not (inside[0] == "{" and following == ("symbol", ":")):
+            word = text.upper()
+            if (previous[0] == "identifier" and previous[1].upper() == "AS") or (inside[1] == "pattern" and previous[1] in ("(", "[")):
+                variables.add(text)
+            elif text in variables and (
+                (following[0] in (None, "symbol") and following[1] != "(")
+                or (following[0] == "identifier" and following[1].upper() in VARIABLE_FOLLOWERS)
+            ):
+                pass  # A use of a bound variable, not a clause
+            elif word in WRITE_KEYWORDS:
+                writes.append(word)
+            elif word == "CALL" and following[0] == "identifier":
+                name = following[1]
+                position = index + 2
+                while position + 1 < len(tokens) and tokens[position] == ("symbol", ".") and tokens[position + 1][0] == "identifier":
+                    name += "." + tokens[position + 1][1]
+                    position += 2
+                if name.lower().startswith(WRITE_PROCEDURE_PREFIXES):
+                    writes.append(f"CALL {name}")
+            elif word == "TRANSACTIONS" and previous[1].upper() == "IN":
+                writes.append("CALL { ... } IN TRANSACTIONS")
+        previous = (kind, text)
+    return {"labels": labels, "relationship_types": relationship_types, "property_keys": property_keys, "writes": writes}
+
+
+def unknown_name_error(code, kind, name, known):
+    message = f"Unknown {kind} '{name}'."
+    suggestions = difflib.get_close_matches(name, sorted(known), n=3)
+    if suggestions:
+        message += " Did you mean " + ", ".join(f"'{s}'" for s in suggestions) + "?"
+    else:
+        message += " Use only: " + ", ".join(sorted(known)) + "."
+    return {"code": code, "message": message}
+
+
+def validate_cypher(query, schema):
+    """Check a generated query against the schema without touching the database; returns a list of errors."""
+    if not query.strip():
+        return [{"code": "empty_query", "message": "The query is empty."}]
+    tokens = tokenize(query)
+    depth = 0
+    for kind, text in tokens:
+        if kind == "symbol" and text in "([{":
+            depth += 1
+        elif kind == "symbol" and text in ")]}":
+            depth -= 1
+        if depth < 0:
+            break
+    if depth != 0:
+        return [{"code": "unbalanced_brackets", "message": "Brackets in the query are not balanced."}]
+
+    names = referenced_names(tokens)
+    known = schema_summary(schema)
+    errors = []
+    for write in dict.fromkeys(names["writes"]):
+        errors.append({"code": "write_clause", "message": f"Write operation '{write}' is not allowed; generate a read-only query."})
+    for label in dict.fromkeys(names["labels"]):
+        if label not in known["labels"]:
+            errors.append(unknown_name_error("unknown_label", "node label", label, known["labels"]))
+    for relationship_type in dict.fromkeys(names["relationship_types"]):
+        if relationship_type not in known["relationship_types"]:
+            errors.append(unknown_name_error("unknown_relationship_type", "relationship type", relationship_type, known["relationship_types"]))
+    for property_key in dict.fromkeys(names["property_keys"]):
+        if property_key not in known["property_keys"]:
+            errors.append(unknown_name_error("unknown_property", "property key", property_key, known["property_keys"]))
+    return errors
+
+
+def explain_errors(query, driver):
+    """Have the server plan the query with EXPLAIN (nothing is executed); returns a list of errors."""
+    from neo4j.exceptions import Neo4jError
+    try:
+        with driver.session() as session:
+            session.run("EXPLAIN " + query).consume()
+    except Neo4jError as e:
+        return [{"code": "explain_failed", "message": e.message or str(e)}]
+    return []
+
+
+async def explain_errors_async(query, driver):
+    from neo4j.exceptions import Neo4jError
+    try:
+        async with driver.session() as session:
+            result = await session.run("EXPLAIN " + query)
+            await result.consume()
+    except Neo4jError as e:
+        return [{"code": "explain_failed", "message": e.message or str(e)}]
+    return []
+
+
+def check_candidate(query, schema, driver=None):
+    """validate_cypher, then EXPLAIN on the server when CYPHER_EXPLAIN is enabled and the local checks pass."""
+    errors = validate_cypher(query, schema)
+    if not errors and driver is not None and cypher_validation_config["CYPHER_EXPLAIN"]:
+        errors = explain_errors(query, driver)
+    return errors
+
+
+async def check_candidate_async(query, schema, driver=None):
+    errors = validate_cypher(query, schema)
+    if not errors and driver is not None and cypher_validation_config["CYPHER_EXPLAIN"]:
+        errors = await explain_errors_async(query, driver)
+    return errors
+
+
+def format_validation_errors(errors):
+    """Render validation errors as feedback for the next generation attempt."""
+    return "\n".join(f"- [{error['code']}] {error['message']}" for error in errors)
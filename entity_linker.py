@@ -0,0 +1,289 @@
+import asyncio, json, os, re, threading
+from dotenv import load_dotenv
+from graph_version import current_graph_version
+
+env_path = 'knowledgegraph/neo4j_creds.env'
+load_dotenv(dotenv_path=env_path)
+
+# Local entity linking. Every node `name` is indexed in memory, together with aliases derived from
+# the name ("Environmental Protection Agency (EPA)" -> "EPA", "Silicon/Chips" -> "Silicon") and any
+# configured in ENTITY_ALIASES_PATH ({"alias": "Exact Name"}). Prompt words are matched against a
+# word trie (longest exact match first), and what is left against a character-trigram index for
+# typos and near misses. The resolved (label, exact name) pairs are appended to the prompt before
+# Cypher generation, and a prompt that clearly names known entities, or a label and a relationship,
+# skips the LLM sanity check. The index is refreshed when the graph version changes; only names
+# that were added or removed since the last refresh touch the trie and trigram index.
+
+entity_linker_config = {
+    "ENTITY_LINKING_ENABLED": os.getenv("ENTITY_LINKING_ENABLED", "true").lower() == "true",
+    "ENTITY_FUZZY_THRESHOLD": float(os.getenv("ENTITY_FUZZY_THRESHOLD", "0.8")),
+    "ENTITY_ALIASES_PATH": os.getenv("ENTITY_ALIASES_PATH"),
+    # Trigrams shared by more phrases than this ("com" in every "Company N") don't select candidates.
+    "ENTITY_FUZZY_MAX_POSTINGS": int(os.getenv("ENTITY_FUZZY_MAX_POSTINGS", "500")),
+}
+
+NAMES_QUERY = "MATCH (n) WHERE n.name IS NOT NULL RETURN labels(n) AS labels, n.name AS name"
+STOPWORDS = {
+    "a", "all", "an", "and", "any", "are", "be", "by", "do", "doe", "for", "from", "how", "in", "is", "it",
+    "its", "list", "many", "me", "of", "on", "or", "show", "that", "the", "their", "thi", "to", "what",
+    "which", "who", "with",
+}
+MAX_FUZZY_WORDS = 3
+END = "\0"  # Trie key marking the end of a phrase
+
+
+def stem(word):
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def normalize_words(text):
+    """Casefolded alphanumeric words with plurals folded, so 'Lithium Mines' matches 'Lithium Mine'."""
+    return tuple(stem(word) for word in re.findall(r"[a-z0-9]+", str(text).casefold()))
+
+
+def trigrams(phrase):
+    text = f" {' '.join(phrase)} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def name_aliases(name):
+    """Alternative spellings implied by a stored name: a parenthesized acronym, the part before it, and '/'-separated parts."""
+    aliases = set()
+    match = re.fullmatch(r"(.+?)\s*\(([^)]+)\)", name)
+    if match:
+        aliases.update(match.groups())
+    if "/" in name:
+        aliases.update(part for part in name.split("/") if len(part.strip()) >= 3)
+    return aliases
+
+
+def load_aliases(path):
+    if not path:
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+class EntityIndex:
+    """Word trie plus trigram index over node names and aliases, updatable in place."""
+
+    def __init__(self, aliases=None, fuzzy_threshold=None):
+        self.fuzzy_threshold = fuzzy_threshold if fuzzy_threshold is not None else entity_linker_config["ENTITY_FUZZY_THRESHOLD"]
+        self.aliases = {}  # exact name -> configured aliases
+        for alias, name in (aliases or {}).items():
+            self.aliases.setdefault(name, set()).add(alias)
+        self.entities = set()  # (label, name)
+        self.phrases = {}  # normalized phrase -> {(label, name)}
+        self.trie = {}
+        self.trigram_index = {}  # trigram -> {phrase}
+
+    def update(self, entities):
+        """Make the index hold exactly `entities` ((label, name) pairs), touching only what changed."""
+        entities = set(entities)
+        for entity in self.entities - entities:
+            for phrase in self._phrases_for(entity[1]):
+                self._remove(phrase, entity)
+        for entity in entities - self.entities:
+            for phrase in self._phrases_for(entity[1]):
+                self._add(phrase, entity)
+        changed = len(entities ^ self.entities)
+        self.entities = entities
+        return changed
+
+    def link(self, prompt, keywords=()):
+        """Resolve mentions in prompt to [{"mention", "label", "name", "score"}], exact matches first.
+
+        Spans made only of stopwords and schema `keywords` (see schema_keywords) are not fuzzy
+        matched: "sector" is the label, not a typo of "Sector 9".
+        """
+        words = normalize_words(prompt)
+        links, covered, seen = [], set(), set()
+
+        def add(start, end, targets, score):
+            covered.update(range(start, end))
+            for label, name in sorted(targets):
+                if (label, name) not in seen:
+                    seen.add((label, name))
+                    links.append({"mention": " ".join(words[start:end]), "label": label, "name": name, "score": round(score, 3)})
+
+        start = 0
+        while start < len(words):
+            end, targets = self._longest_match(words, start)
+            if targets:
+                add(start, end, targets, 1.0)
+                start = end
+            else:
+                start += 1
+
+        candidates = []
+        for start in range(len(words)):
+            for end in range(start + 1, min(start + MAX_FUZZY_WORDS, len(words)) + 1):
+                span = words[start:end]
+                if covered.intersection(range(start, end)) or all(word in STOPWORDS for word in span) or len(" ".join(span)) < 4:
+                    continue
+                if all(word in STOPWORDS or mentions_keyword({word}, keywords) for word in span):
+                    continue
+                phrase, score = self._best_fuzzy(span)
+                if phrase:
+                    candidates.append((score, start, end, phrase))
+        for score, start, end, phrase in sorted(candidates, key=lambda candidate: -candidate[0]):
+            if not covered.intersection(range(start, end)):
+                add(start, end, self.phrases[phrase], score)
+        return links
+
+    def _phrases_for(self, name):
+        names = {name} | name_aliases(name) | self.aliases.get(name, set())
+        phrases = {normalize_words(alias) for alias in names}
+        return {phrase for phrase in phrases if phrase and not all(word in STOPWORDS for word in phrase)}
+
+    def _add(self, phrase, entity):
+        targets = self.phrases.setdefault(phrase, set())
+        if not targets:
+            node = self.trie
+            for word in phrase:
+                node = node.setdefault(word, {})
+            node[END] = targets
+            for trigram in trigrams(phrase):
+                self.trigram_index.setdefault(trigram, set()).add(phrase)
+        targets.add(entity)
+
+    def _remove(self, phrase, entity):
+        targets = self.phrases.get(phrase)
+        if targets is None:
+            return
+        targets.discard(entity)
+        if not targets:
+            # The emptied set stays in the trie, where it simply never matches.
+            del self.phrases[phrase]
+            for trigram in trigrams(phrase):
+                self.trigram_index.get(trigram, set()).discard(phrase)
+
+    def _longest_match(self, words, start):
+        node, best = self.trie, (start, None)
+        for end in range(start, len(words)):
+            node = node.get(words[end])
+            if node is None:
+                break
+            if node.get(END):
+                best = (end + 1, node[END])
+        return best
+
+    def _best_fuzzy(self, span):
+        span_trigrams = trigrams(span)
+        # Candidates come from the selective trigrams only; a phrase close enough to pass the
+        # threshold shares most trigrams with the span, so it shares a selective one too unless
+        # the span is made of common fragments, in which case it isn't worth matching.
+        max_postings = entity_linker_config["ENTITY_FUZZY_MAX_POSTINGS"]
+        candidates = set()
+        for trigram in span_trigrams:
+            postings = self.trigram_index.get(trigram, ())
+            if len(postings) <= max_postings:
+                candidates.update(postings)
+        best, best_score = None, self.fuzzy_threshold
+        for phrase in candidates:
+            if len(" ".join(phrase)) < 4:
+                continue  # Acronyms only match exactly
+            phrase_trigrams = trigrams(phrase)
+            score = 2 * len(span_trigrams & phrase_trigrams) / (len(span_trigrams) + len(phrase_trigrams))
+            if score >= best_score:
+                best, best_score = phrase, score
+        return best, best_score
+
+
+class EntityLinker:
+    """Keeps an EntityIndex in step with the graph version."""
+
+    def __init__(self, aliases=None):
+        self.index = EntityIndex(aliases if aliases is not None else load_aliases(entity_linker_config["ENTITY_ALIASES_PATH"]))
+        self.version = None
+        self._lock = threading.Lock()
+        self._async_lock = None
+
+    def get(self, driver):
+        with self._lock:
+            version = current_graph_version()
+            if version != self.version:
+                with driver.session() as session:
+                    rows = [record.data() for record in session.run(NAMES_QUERY)]
+                self._refresh(rows, version)
+        return self.index
+
+    async def get_async(self, driver):
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        async with self._async_lock:
+            version = current_graph_version()
+            if version != self.version:
+                async with driver.session() as session:
+                    result = await session.run(NAMES_QUERY)
+                    rows = [record.data() async for record in result]
+                self._refresh(rows, version)
+        return self.index
+
+    def _refresh(self, rows, version):
+        self.index.update((label, str(row["name"])) for row in rows for label in row["labels"])
+        self.version = version
+
+
+entity_linker = EntityLinker()
+
+
+def link_entities(driver, prompt, schema=None):
+    if not entity_linker_config["ENTITY_LINKING_ENABLED"]:
+        return []
+    return entity_linker.get(driver).link(prompt, schema_words(schema))
+
+
+async def link_entities_async(driver, prompt, schema=None):
+    if not entity_linker_config["ENTITY_LINKING_ENABLED"]:
+        return []
+    return (await entity_linker.get_async(driver)).link(prompt, schema_words(schema))
+
+
+def annotate_prompt(prompt, links):
+    """Append the resolved entities to the prompt so the generator uses exact stored names."""
+    if not links:
+        return prompt
+    resolved = "; ".join(f"'{link['mention']}' -> (:{link['label']} {{name: {json.dumps(link['name'])}}})" for link in links)
+    return f"{prompt}\n(Entities mentioned in this prompt, with their exact stored names: {resolved})"
+
+
+def schema_keywords(schema):
+    """Word stems of the schema's labels and relationship types, e.g. RawMaterials -> raw, material."""
+    labels, relationship_types = set(), set()
+    for row in schema:
+        for label in (row.get("entityTypes") or []) + (row.get("relatedEntityTypes") or []):
+            labels.update(normalize_words(re.sub(r"(?<=[a-z])(?=[A-Z])", " ", label)))
+        if row.get("relationshipType"):
+            relationship_types.update(normalize_words(row["relationshipType"].replace("_", " ")))
+    # HAS_COMPANY names a label, not a relationship: label words (and "has") would let any prompt
+    # mentioning "company" pass for label + relationship.
+    relationship_types -= labels | STOPWORDS | {"has"}
+    return {word for word in labels if len(word) >= 3}, {word for word in relationship_types if len(word) >= 4}
+
+
+def schema_words(schema):
+    """Label and relationship words of the schema, which the linker must not fuzzy match to entities."""
+    if not schema:
+        return set()
+    labels, relationship_types = schema_keywords(schema)
+    return labels | relationship_types
+
+
+def mentions_keyword(words, keywords):
+    # Shared five-letter prefixes catch inflections such as impacted/impacts or supplies/supplier.
+    return any(word == keyword or (len(word) >= 5 and len(keyword) >= 5 and word[:5] == keyword[:5]) for word in words for keyword in keywords)
+
+
+def local_sanity_check(prompt, schema, links):
+    """True when the prompt clearly fits the graph, so the LLM sanity check can be skipped; never answers 'no'."""
+    # A fuzzy link may be a near miss on an unrelated word, so only exact mentions count.
+    if any(link["score"] == 1.0 for link in links):
+        return True
+    words = set(normalize_words(prompt))
+    labels, relationship_types = schema_keywords(schema)
+    return mentions_keyword(words, labels) and mentions_keyword(words, relationship_types)
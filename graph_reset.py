@@ -0,0 +1,95 @@
+import argparse, os
+from dotenv import load_dotenv
+from graph_version import bump_graph_version
+from schema_cache import quote_identifier
+from bulk_loader import Progress, DATASET_PROPERTY
+from index_manager import ensure_property_indexes
+
+env_path = 'knowledgegraph/neo4j_creds.env'
+load_dotenv(dotenv_path=env_path)
+
+# Chunked graph reset. Instead of one `MATCH (n) DETACH DELETE n` transaction, relationships and
+# then nodes are deleted with CALL { ... } IN TRANSACTIONS, which commits every $batch_size rows
+# in its own short write transaction, so memory stays bounded and concurrent readers are never
+# locked out for long. Each query is a single pass over the nodes in scope: a batch never rescans
+# nodes whose relationships an earlier batch already deleted. Relationships go first and are
+# batched by relationship, so a node with millions of edges doesn't turn into one huge
+# transaction. CALL IN TRANSACTIONS needs an auto-commit transaction (session.run). Deletion can
+# be scoped to labels and/or a dataset tag written by bulk_loader.py. A dataset-scoped reset first
+# puts a range index on the tag for every label in scope (all labels when none are given) and
+# deletes label by label, so each batch is an index seek rather than a scan of the whole label.
+
+graph_reset_config = {
+    "RESET_BATCH_SIZE": int(os.getenv("RESET_BATCH_SIZE", "10000")),
+}
+
+DELETE_RELATIONSHIPS_QUERY = '''
+MATCH (n{label})
+{where}
+MATCH {pattern}
+CALL {{ WITH r DELETE r }} IN TRANSACTIONS OF $batch_size ROWS
+RETURN count(*) AS deleted
+'''
+# Outgoing first, then incoming: a relationship between two nodes in scope is gone by the time the
+# second pass reaches it, so each one is deleted once without a DISTINCT over every relationship.
+RELATIONSHIP_PATTERNS = ("(n)-[r]->()", "(n)<-[r]-()")
+DELETE_NODES_QUERY = '''
+MATCH (n{label})
+{where}
+CALL {{ WITH n DETACH DELETE n }} IN TRANSACTIONS OF $batch_size ROWS
+RETURN count(*) AS deleted
+'''
+LABELS_QUERY = "CALL db.labels() YIELD label RETURN label"
+
+
+def graph_labels(driver):
+    with driver.session() as session:
+        return [record["label"] for record in session.run(LABELS_QUERY)]
+
+
+def delete_in_batches(driver, query, batch_size, params, progress):
+    with driver.session() as session:
+        deleted = session.run(query, batch_size=batch_size, **params).single()["deleted"]
+    progress.add(deleted)
+
+
+def reset_graph(driver, labels=None, dataset=None, batch_size=None):
+    """Delete the nodes with any of `labels` (all nodes if None), optionally only those tagged with `dataset`."""
+    batch_size = batch_size or graph_reset_config["RESET_BATCH_SIZE"]
+    where = f"WHERE n.{quote_identifier(DATASET_PROPERTY)} = $dataset" if dataset else ""
+    params = {"dataset": dataset} if dataset else {}
+    if dataset:
+        # A range index only covers one label, so an unscoped dataset reset goes label by label.
+        labels = labels or graph_labels(driver)
+        ensure_property_indexes(driver, labels, DATASET_PROPERTY)
+    scopes = [":" + quote_identifier(label) for label in labels] if labels else [""]
+    relationships = Progress("relationships", verb="deleted")
+    nodes = Progress("nodes", verb="deleted")
+    try:
+        for label in scopes:
+            for pattern in RELATIONSHIP_PATTERNS:
+                query = DELETE_RELATIONSHIPS_QUERY.format(label=label, where=where, pattern=pattern)
+                delete_in_batches(driver, query, batch_size, params, relationships)
+            delete_in_batches(driver, DELETE_NODES_QUERY.format(label=label, where=where), batch_size, params, nodes)
+    finally:
+        bump_graph_version()
+    summary = {"relationships": relationships.summary(), "nodes": nodes.summary()}
+    print(f"Deleted: {summary}")
+    return summary
+
+
+def main():
+    from neo4j import GraphDatabase
+    parser = argparse.ArgumentParser(description="Delete graph data in bounded batches.")
+    parser.add_argument("--label", action="append", dest="labels", help="only delete nodes with this label (repeatable)")
+    parser.add_argument("--dataset", help="only delete nodes tagged with this dataset")
+    parser.add_argument("--batch-size", type=int, default=graph_reset_config["RESET_BATCH_SIZE"])
+    args = parser.parse_args()
+    driver = GraphDatabase.driver(os.getenv("NEO4J_URI"), auth=(os.getenv("NEO4J_USERNAME"), os.getenv("NEO4J_PASSWORD")))
+    try:
+        reset_graph(driver, args.labels, args.dataset, args.batch_size)
+    finally:
+        driver.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+import os
+from dotenv import load_dotenv
+
+env_path = 'knowledgegraph/neo4j_creds.env'
+load_dotenv(dotenv_path=env_path)
+
+# Graph version counter. Every process that writes to the graph (create_db.py and the loaders)
+# bumps it, and every cache derived from graph contents (schema, question -> Cypher, Cypher ->
+# results) records the version it was built at and treats entries from another version as stale.
+# The counter is a small file, so reading it is a stat call and works across processes; point
+# GRAPH_VERSION_PATH at a shared location when the loader runs on another machine.
+
+graph_version_config = {
+    "GRAPH_VERSION_PATH": os.getenv("GRAPH_VERSION_PATH", ".cache/graph_version"),
+}
+
+_last_read = (None, 0)  # ((inode, mtime) of the file, version)
+
+
+def current_graph_version():
+    global _last_read
+    path = graph_version_config["GRAPH_VERSION_PATH"]
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return 0
+    # bump_graph_version replaces the file, so a new inode means a new version even within one mtime tick.
+    identity = (stat.st_ino, stat.st_mtime_ns)
+    if _last_read[0] == identity:
+        return _last_read[1]
+    try:
+        with open(path) as f:
+            version = int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        version = 0
+    _last_read = (identity, version)
+    return version
+
+
+def bump_graph_version():
+    """Mark every cached view of the graph as stale; call after writing to the graph."""
+    path = graph_version_config["GRAPH_VERSION_PATH"]
+    version = current_graph_version() + 1
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(str(version))
+    os.replace(tmp_path, path)
+    return version
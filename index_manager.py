@@ -0,0 +1,150 @@
+import os
+from dotenv import load_dotenv
+from schema_cache import schema_cache, quote_identifier
+from bulk_loader import KEY_PROPERTY, create_constraints
+
+env_path = 'knowledgegraph/neo4j_creds.env'
+load_dotenv(dotenv_path=env_path)
+
+# Index management for entity lookups. Every label in the schema that has a `name` property gets
+# a uniqueness constraint (or a plain range index when existing names are not unique), and one
+# full-text index covers `name` on all of those labels for fuzzy, case-insensitive matching. The
+# Cypher generator is told which lookup forms hit these indexes, so generated queries anchor on
+# an index seek instead of scanning a label with toLower(n.name) or CONTAINS.
+
+index_manager_config = {
+    "FULLTEXT_INDEX_NAME": os.getenv("FULLTEXT_INDEX_NAME", "entity_names"),
+    "INDEX_AWAIT_SECONDS": int(os.getenv("INDEX_AWAIT_SECONDS", "300")),
+}
+
+SHOW_INDEXES_QUERY = '''
+SHOW INDEXES YIELD name, type, entityType, labelsOrTypes, properties
+WHERE entityType = 'NODE'
+RETURN name, type, labelsOrTypes, properties
+'''
+DUPLICATE_NAMES_QUERY = '''
+MATCH (n:{label}) WHERE n.{key} IS NOT NULL
+WITH n.{key} AS value, count(*) AS copies WHERE copies > 1
+RETURN count(*) AS duplicates
+'''
+RANGE_INDEX_QUERY = "CREATE INDEX {name} IF NOT EXISTS FOR (n:{label}) ON (n.{key})"
+FULLTEXT_INDEX_QUERY = "CREATE FULLTEXT INDEX {name} IF NOT EXISTS FOR (n:{labels}) ON EACH [n.{key}]"
+
+# What the generator is told about the indexes; filled by refresh_index_status / ensure_indexes.
+index_status = {"exact": [], "fulltext": None, "fulltext_labels": []}
+
+
+def status_from_indexes(indexes, key=KEY_PROPERTY):
+    """Summarize SHOW INDEXES rows into the labels with an exact-match index on key and the full-text index."""
+    status = {"exact": [], "fulltext": None, "fulltext_labels": []}
+    for index in indexes:
+        if index["properties"] != [key]:
+            continue
+        if index["type"] == "RANGE":
+            status["exact"].extend(index["labelsOrTypes"])
+        elif index["type"] == "FULLTEXT" and index["name"] == index_manager_config["FULLTEXT_INDEX_NAME"]:
+            status["fulltext"] = index["name"]
+            status["fulltext_labels"] = sorted(index["labelsOrTypes"])
+    status["exact"] = sorted(set(status["exact"]))
+    return status
+
+
+def refresh_index_status(driver):
+    with driver.session() as session:
+        indexes = [record.data() for record in session.run(SHOW_INDEXES_QUERY)]
+    index_status.update(status_from_indexes(indexes))
+    return index_status
+
+
+async def refresh_index_status_async(driver):
+    async with driver.session() as session:
+        result = await session.run(SHOW_INDEXES_QUERY)
+        indexes = [record.data() async for record in result]
+    index_status.update(status_from_indexes(indexes))
+    return index_status
+
+
+def labels_with_key(schema, key=KEY_PROPERTY):
+    labels = set()
+    for row in schema:
+        if key in (row.get("propertyKeys") or ()):
+            labels.update(row.get("entityTypes") or ())
+    return sorted(labels)
+
+
+def index_name(label, key=KEY_PROPERTY):
+    return "".join(ch if ch.isalnum() else "_" for ch in f"{label}_{key}_range")
+
+
+def ensure_property_indexes(driver, labels, key):
+    """Range index on key for each label (e.g. the dataset tag graph_reset.py filters on), then wait for them to come online."""
+    with driver.session() as session:
+        for label in labels:
+            session.run(RANGE_INDEX_QUERY.format(
+                name=quote_identifier(index_name(label, key)), label=quote_identifier(label), key=quote_identifier(key)
+            )).consume()
+        session.run("CALL db.awaitIndexes($seconds)", seconds=index_manager_config["INDEX_AWAIT_SECONDS"]).consume()
+
+
+def ensure_indexes(driver, schema=None, key=KEY_PROPERTY):
+    """Create the constraints/indexes for every label in the schema that has `key`, then wait for them to come online."""
+    schema = schema if schema is not None else schema_cache.get(driver)
+    labels = labels_with_key(schema, key)
+    status = refresh_index_status(driver)
+    with driver.session() as session:
+        for label in labels:
+            if label in status["exact"]:
+                continue
+            duplicates = session.run(
+                DUPLICATE_NAMES_QUERY.format(label=quote_identifier(label), key=quote_identifier(key))
+            ).single()["duplicates"]
+            if duplicates:
+                print(f"{label}.{key} has {duplicates} duplicated values; creating a range index instead of a uniqueness constraint.")
+                session.run(RANGE_INDEX_QUERY.format(
+                    name=quote_identifier(index_name(label, key)), label=quote_identifier(label), key=quote_identifier(key)
+                )).consume()
+            else:
+                create_constraints(driver, [label], key)
+        fulltext_name = index_manager_config["FULLTEXT_INDEX_NAME"]
+        if labels and status["fulltext_labels"] != labels:
+            # A full-text index can't be altered, so a new label means rebuilding it.
+            if status["fulltext"]:
+                session.run(f"DROP INDEX {quote_identifier(fulltext_name)} IF EXISTS").consume()
+            session.run(FULLTEXT_INDEX_QUERY.format(
+                name=quote_identifier(fulltext_name),
+                labels="|".join(quote_identifier(label) for label in labels),
+                key=quote_identifier(key),
+            )).consume()
+        session.run("CALL db.awaitIndexes($seconds)", seconds=index_manager_config["INDEX_AWAIT_SECONDS"]).consume()
+    return refresh_index_status(driver)
+
+
+def index_hint_message():
+    """System message telling the Cypher generator which lookups are index-backed, or None if unknown."""
+    if not index_status["exact"] and not index_status["fulltext"]:
+        return None
+    hints = ["Indexed lookups: anchor the query on an indexed entity lookup whenever the prompt names an entity."]
+    if index_status["exact"]:
+        hints.append(
+            f"Exact matches on name are index seeks for {', '.join(index_status['exact'])}: "
+            "use `MATCH (c:Company {name: 'Tesla'})` with the exact stored name."
+        )
+    if index_status["fulltext"]:
+        hints.append(
+            f"For case-insensitive, partial or fuzzy names use the full-text index instead of toLower() or CONTAINS, "
+            f"which scan every node of the label: `CALL db.index.fulltext.queryNodes('{index_status['fulltext']}', 'tesla~') "
+            "YIELD node, score WHERE node:Company WITH node, score ORDER BY score DESC LIMIT 1` and continue from node."
+        )
+    return {"role": "system", "content": " ".join(hints)}
+
+
+def main():
+    from neo4j import GraphDatabase
+    driver = GraphDatabase.driver(os.getenv("NEO4J_URI"), auth=(os.getenv("NEO4J_USERNAME"), os.getenv("NEO4J_PASSWORD")))
+    try:
+        print(ensure_indexes(driver))
+    finally:
+        driver.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+import os, re, threading, time
+from dotenv import load_dotenv
+from schema_cache import quote_identifier
+from cypher_validator import validate_cypher
+from entity_linker import STOPWORDS, normalize_words, mentions_keyword
+from query_executor import execute_read_query, execute_read_query_async
+from query_cache import cached_result, remember_result, schema_fingerprint
+
+env_path = 'knowledgegraph/neo4j_creds.env'
+load_dotenv(dotenv_path=env_path)
+
+# Intent templates for the common question shapes ("which companies are impacted by X", "who
+# supplies Y", "which countries possess mines for Z", "companies in sector S"). A template fires
+# only when the prompt links to exactly one known entity whose label the template's relationship
+# reaches in the schema, names the template's subject and relationship, and says nothing else:
+# every other word has to be a stopword or a filler word, so a qualifier the template cannot
+# express ("Indian companies", "headquartered in Germany") sends the question to the LLM. The
+# parameterized query is
+# validated against the schema, run directly and answered from the rows, with no LLM call;
+# anything else falls back to generation. template_stats() reports the hit rate and the latency
+# saved compared to the average LLM path.
+
+intent_templates_config = {
+    "INTENT_TEMPLATES_ENABLED": os.getenv("INTENT_TEMPLATES_ENABLED", "true").lower() == "true",
+    "INTENT_TEMPLATE_MAX_WORDS": int(os.getenv("INTENT_TEMPLATE_MAX_WORDS", "12")),
+}
+
+# Words that change the meaning of a question beyond what a template returns.
+BLOCKING_WORDS = {
+    "not", "no", "never", "without", "except", "exclude", "excluding", "count", "number", "many", "much",
+    "more", "less", "most", "least", "compare", "both", "between", "only", "average", "total", "why", "how",
+    "if", "percentage",
+}
+
+# Words (stemmed, like normalize_words) that carry no condition and may appear in a templated question.
+FILLER_WORDS = {
+    "are", "is", "was", "were", "been", "being", "have", "has", "can", "you", "please", "give", "tell",
+    "name", "find", "get", "see", "display", "currently", "there", "these", "those", "one",
+}
+
+# subject_label/relationship: the subject is related to the linked entity through relationship;
+# subject_is_start tells which end of the relationship the subject is on. keywords are synonyms
+# added to the words of the relationship type, subject_words the ways the subject can be named.
+INTENT_TEMPLATES = [
+    {
+        "intent": "impacted_by",
+        "subject_label": "Company", "relationship": "IMPACTED_BY", "subject_is_start": True,
+        "keywords": {"affected", "affect", "hit", "exposed"},
+        "subject_words": {"company", "firm", "who"},
+        "answer": "Companies impacted by {name}: {values}.",
+    },
+    {
+        "intent": "supplies",
+        "subject_label": "Company", "relationship": "SUPPLIES", "subject_is_start": True,
+        "keywords": {"supplier", "provide", "provider", "produce", "producer"},
+        "subject_words": {"company", "firm", "who"},
+        "answer": "Suppliers of {name}: {values}.",
+    },
+    {
+        "intent": "countries_with_mines",
+        "subject_label": "Country", "relationship": "POSSESSED_BY", "subject_is_start": True,
+        "keywords": {"mine", "mining"},
+        "subject_words": {"country", "nation", "where"},
+        # A raw material is matched to the mines named after it ('Lithium' -> 'Lithium Mine').
+        "entity_labels": ("Mine", "RawMaterials"),
+        "query": (
+            "MATCH (s:Country)-[:POSSESSED_BY]->(m:Mine) WHERE m.name = $name OR m.name STARTS WITH $prefix "
+            "RETURN DISTINCT s.name AS country, m.name AS mine ORDER BY country"
+        ),
+        "answer": "Countries possessing mines for {name}: {values}.",
+    },
+    {
+        "intent": "sector_companies",
+        "subject_label": "Company", "relationship": "HAS_COMPANY", "subject_is_start": False,
+        "keywords": {"sector", "industry", "in"},
+        "subject_words": {"company", "firm", "player"},
+        "answer": "Companies in the {name} sector: {values}.",
+    },
+]
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "template_seconds": 0.0, "llm_paths": 0, "llm_seconds": 0.0}
+
+
+def template_query(template, label):
+    if template.get("query"):
+        return template["query"]
+    subject = f"(s:{quote_identifier(template['subject_label'])})"
+    entity = f"(e:{quote_identifier(label)} {{name: $name}})"
+    relationship = f"-[:{quote_identifier(template['relationship'])}]->"
+    pattern = subject + relationship + entity if template["subject_is_start"] else entity + relationship + subject
+    alias = re.sub(r"(?<=[a-z])(?=[A-Z])", "_", template["subject_label"]).lower()
+    return f"MATCH {pattern} RETURN DISTINCT s.name AS {alias} ORDER BY {alias}"
+
+
+def entity_labels(template, schema):
+    """Labels the template's relationship reaches from its subject in this schema."""
+    if template.get("entity_labels"):
+        return set(template["entity_labels"])
+    labels = set()
+    for row in schema:
+        if row.get("relationshipType") != template["relationship"]:
+            continue
+        subject_side, entity_side = row.get("entityTypes") or [], row.get("relatedEntityTypes") or []
+        if not template["subject_is_start"]:
+            subject_side, entity_side = entity_side, subject_side
+        if template["subject_label"] in subject_side:
+            labels.update(entity_side)
+    return labels
+
+
+def template_keywords(template):
+    # HAS_COMPANY contributes nothing beyond its subject; IMPACTED_BY contributes "impacted".
+    words = set(normalize_words(template["relationship"].replace("_", " "))) - STOPWORDS - {"has"}
+    return words - set(normalize_words(template["subject_label"])) | template["keywords"]
+
+
+_validated = {}  # (schema fingerprint, query) -> bool
+
+
+def is_valid(query, schema):
+    key = (schema_fingerprint(schema), query)
+    if key not in _validated:
+        if len(_validated) > 256:
+            _validated.clear()
+        _validated[key] = not validate_cypher(query, schema)
+    return _validated[key]
+
+
+def match_intent(prompt, schema, links):
+    """Return {"template", "query", "params", "name"} when exactly one template confidently fits, else None."""
+    if not intent_templates_config["INTENT_TEMPLATES_ENABLED"]:
+        return None
+    words = set(normalize_words(prompt))
+    exact = {(link["label"], link["name"]) for link in links if link["score"] == 1.0}
+    if (
+        len(exact) != 1 or len(links) != len(exact)
+        or len(normalize_words(prompt)) > intent_templates_config["INTENT_TEMPLATE_MAX_WORDS"]
+        or words & BLOCKING_WORDS
+    ):
+        return None
+    label, name = next(iter(exact))
+    matches = []
+    for template in INTENT_TEMPLATES:
+        if (
+            label in entity_labels(template, schema)
+            and mentions_keyword(words, template_keywords(template))
+            and mentions_keyword(words, template["subject_words"])
+        ):
+            matches.append(template)
+    if len(matches) != 1:
+        return None
+    template = matches[0]
+    # Another template's relationship in the prompt means the question has more to it.
+    for other in INTENT_TEMPLATES:
+        if other is not template and mentions_keyword(words, template_keywords(other) - template_keywords(template) - {"in"}):
+            return None
+    # So does any word the template does not account for: a qualifier, a second condition.
+    mention_words = {word for link in links for word in normalize_words(link["mention"])}
+    known = template_keywords(template) | template["subject_words"] | set(normalize_words(re.sub(r"(?<=[a-z])(?=[A-Z])", " ", label)))
+    for word in words - STOPWORDS - FILLER_WORDS - mention_words:
+        if not mentions_keyword({word}, known):
+            return None
+    query = template_query(template, label)
+    if not is_valid(query, schema):
+        return None
+    params = {"name": name}
+    if "$prefix" in query:
+        params["prefix"] = re.split(r"[/(]", name)[0].strip() + " "
+    return {"template": template, "query": query, "params": params, "name": name}
+
+
+def template_answer(match, rows):
+    values = []
+    for row in rows:
+        row_values = [str(value) for value in row.values()]
+        values.append(row_values[0] + (f" ({', '.join(row_values[1:])})" if len(row_values) > 1 else ""))
+    return match["template"]["answer"].format(name=match["name"], values=", ".join(values))
+
+
+def run_template(driver, match):
+    execution = cached_result(match["query"], match["params"])
+    if execution is None:
+        execution = execute_read_query(driver, match["query"], match["params"])
+        remember_result(match["query"], execution, match["params"])
+    return execution
+
+
+async def run_template_async(driver, match):
+    execution = cached_result(match["query"], match["params"])
+    if execution is None:
+        execution = await execute_read_query_async(driver, match["query"], match["params"])
+        remember_result(match["query"], execution, match["params"])
+    return execution
+
+
+def record_template(hit, seconds=0.0):
+    with _stats_lock:
+        if hit:
+            _stats["hits"] += 1
+            _stats["template_seconds"] += seconds
+        else:
+            _stats["misses"] += 1
+
+
+def record_llm_path(seconds):
+    with _stats_lock:
+        _stats["llm_paths"] += 1
+        _stats["llm_seconds"] += seconds
+
+
+def template_stats():
+    """Hit rate and the latency saved by template answers, estimated from the average LLM path seen so far."""
+    with _stats_lock:
+        stats = dict(_stats)
+    total = stats["hits"] + stats["misses"]
+    mean_llm = stats["llm_seconds"] / stats["llm_paths"] if stats["llm_paths"] else None
+    mean_template = stats["template_seconds"] / stats["hits"] if stats["hits"] else None
+    saved = (mean_llm - mean_template) * stats["hits"] if mean_llm is not None and mean_template is not None else None
+    return {
+        "hits": stats["hits"],
+        "misses": stats["misses"],
+        "hit_rate": round(stats["hits"] / total, 3) if total else None,
+        "mean_template_s": round(mean_template, 4) if mean_template is not None else None,
+        "mean_llm_path_s": round(mean_llm, 3) if mean_llm is not None else None,
+        "estimated_saved_s": round(saved, 3) if saved is not None else None,
+    }
+
+
+def answer_from_template(driver, prompt, schema, links):
+    """Answer prompt from a template; returns (match, execution, answer), or None to fall back to the LLM."""
+    started = time.perf_counter()
+    match = match_intent(prompt, schema, links)
+    if match is not None:
+        execution = run_template(driver, match)
+        if execution["rows"]:
+            record_template(True, time.perf_counter() - started)
+            return match, execution, template_answer(match, execution["rows"])
+    record_template(False)
+    return None
+
+
+async def answer_from_template_async(driver, prompt, schema, links):
+    started = time.perf_counter()
+    match = match_intent(prompt, schema, links)
+    if match is not None:
+        execution = await run_template_async(driver, match)
+        if execution["rows"]:
+            record_template(True, time.perf_counter() - started)
+            return match, execution, template_answer(match, execution["rows"])
+    record_template(False)
+    return None
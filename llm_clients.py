@@ -0,0 +1,351 @@
+import os, threading
+from dotenv import load_dotenv
+from tracing import record_llm_usage
+
+env_path = 'knowledgegraph/neo4j_creds.env'
+load_dotenv(dotenv_path=env_path)
+
+# Long-lived LLM clients keyed by model name. Each client is built once with a keep-alive
+# connection pool and reused by every query_llm call, so a question no longer pays a TLS
+# handshake per LLM round trip. SDK imports happen inside the backends, when a client is first
+# built; the async clients used by async_pipeline.py are built on the first acomplete call, inside
+# the event loop that will use them. Tests can swap in another backend with register_backend / set_model_backend, or point
+# every model at a local OpenAI-compatible fake server with LLM_BACKEND=openai and LLM_BASE_URL.
+# stream()/astream() yield a completion as text deltas while it is generated (answer_stream.py);
+# backends without them hand back the whole completion as a single piece.
+
+llm_client_config = {
+    "LLM_BACKEND": os.getenv("LLM_BACKEND"),
+    "LLM_BASE_URL": os.getenv("LLM_BASE_URL"),
+    "LLM_TIMEOUT": float(os.getenv("LLM_TIMEOUT", "60")),
+    "LLM_CONNECT_TIMEOUT": float(os.getenv("LLM_CONNECT_TIMEOUT", "10")),
+    "LLM_MAX_CONNECTIONS": int(os.getenv("LLM_MAX_CONNECTIONS", "20")),
+    "LLM_MAX_KEEPALIVE_CONNECTIONS": int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10")),
+    "LLM_KEEPALIVE_EXPIRY": float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30")),
+}
+
+# Which backend serves each model name used by query_llm.
+model_backends = {
+    "gpt-35-turbo": "azure_openai",
+    "gpt-4o": "azure_inference",
+    "openai": "openai",
+}
+
+
+def httpx_client_options(config):
+    import httpx
+    return {
+        "timeout": httpx.Timeout(config["LLM_TIMEOUT"], connect=config["LLM_CONNECT_TIMEOUT"]),
+        "limits": httpx.Limits(
+            max_connections=config["LLM_MAX_CONNECTIONS"],
+            max_keepalive_connections=config["LLM_MAX_KEEPALIVE_CONNECTIONS"],
+            keepalive_expiry=config["LLM_KEEPALIVE_EXPIRY"],
+        ),
+    }
+
+
+def chunk_text(chunk):
+    """Text delta of a streamed chat completion chunk (openai or azure.ai.inference); usage-only chunks have none."""
+    record_llm_usage(getattr(chunk, "usage", None))
+    if chunk.choices and chunk.choices[0].delta.content:
+        return chunk.choices[0].delta.content
+    return ""
+
+
+class AzureOpenAIBackend:
+    """gpt-35-turbo through the AzureOpenAI SDK."""
+
+    def __init__(self, config):
+        from openai import AzureOpenAI
+        import httpx
+        self.config = config
+        self.model = os.getenv("AZURE_OPENAI_MODEL_NAME")
+        self.client_options = {
+            "azure_endpoint": os.getenv("AZURE_OPENAI_ENDPOINT"),
+            "api_key": os.getenv("AZURE_OPENAI_API_KEY"),
+            "api_version": os.getenv("AZURE_OPENAI_API_VERSION"),
+        }
+        self.http_client = httpx.Client(**httpx_client_options(config))
+        self.client = AzureOpenAI(http_client=self.http_client, **self.client_options)
+        self.async_client = None
+
+    def complete(self, messages, **options):
+        response = self.client.chat.completions.create(model=self.model, messages=messages, **options)
+        record_llm_usage(response.usage)
+        return response.choices[0].message.content.strip()
+
+    def stream(self, messages, **options):
+        for chunk in self.client.chat.completions.create(model=self.model, messages=messages, stream=True, **options):
+            text = chunk_text(chunk)
+            if text:
+                yield text
+
+    def get_async_client(self):
+        if self.async_client is None:
+            from openai import AsyncAzureOpenAI
+            import httpx
+            self.async_client = AsyncAzureOpenAI(
+                http_client=httpx.AsyncClient(**httpx_client_options(self.config)), **self.client_options
+            )
+        return self.async_client
+
+    async def acomplete(self, messages, **options):
+        response = await self.get_async_client().chat.completions.create(model=self.model, messages=messages, **options)
+        record_llm_usage(response.usage)
+        return response.choices[0].message.content.strip()
+
+    async def astream(self, messages, **options):
+        chunks = await self.get_async_client().chat.completions.create(model=self.model, messages=messages, stream=True, **options)
+        async for chunk in chunks:
+            text = chunk_text(chunk)
+            if text:
+                yield text
+
+    def close(self):
+        self.http_client.close()
+
+    async def aclose(self):
+        if self.async_client is not None:
+            await self.async_client.close()
+            self.async_client = None
+
+
+class AzureInferenceBackend:
+    """gpt-4o through azure.ai.inference, on a pooled requests session."""
+
+    def __init__(self, config):
+        from azure.ai.inference import ChatCompletionsClient
+        from azure.core.credentials import AzureKeyCredential
+        from azure.core.pipeline.transport import RequestsTransport
+        import requests
+        self.config = config
+        self.model = os.getenv("AZURE_OPENAI_MODEL_NAME_4o")
+        self.endpoint = os.getenv("AZURE_OPENAI_ENDPOINT_4o")
+        self.credential = AzureKeyCredential(os.getenv("AZURE_OPENAI_API_KEY_4o"))
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=config["LLM_MAX_KEEPALIVE_CONNECTIONS"],
+            pool_maxsize=config["LLM_MAX_CONNECTIONS"],
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.client = ChatCompletionsClient(
+            endpoint=self.endpoint,
+            credential=self.credential,
+            transport=RequestsTransport(session=self.session, session_owner=False),
+            connection_timeout=config["LLM_CONNECT_TIMEOUT"],
+            read_timeout=config["LLM_TIMEOUT"],
+        )
+        self.async_client = None
+
+    def request(self, messages, options):
+        from azure.ai.inference.models import SystemMessage, UserMessage
+        # Create a list to hold the message instances
+        all_messages = []
+        for message in messages:
+            if message["role"] == "system":
+                all_messages.append(SystemMessage(content=message["content"]))
+            elif message["role"] == "user":
+                all_messages.append(UserMessage(content=message["content"]))
+        params = {"max_tokens": 4096, "temperature": 1.0, "top_p": 1.0}
+        params.update(options)
+        return {"messages": all_messages, "model": self.model, **params}
+
+    def complete(self, messages, **options):
+        response = self.client.complete(**self.request(messages, options))
+        record_llm_usage(response.usage)
+        return response.choices[0].message.content.strip()
+
+    def stream(self, messages, **options):
+        for update in self.client.complete(stream=True, **self.request(messages, options)):
+            text = chunk_text(update)
+            if text:
+                yield text
+
+    def get_async_client(self):
+        if self.async_client is None:
+            from azure.ai.inference.aio import ChatCompletionsClient
+            self.async_client = ChatCompletionsClient(
+                endpoint=self.endpoint,
+                credential=self.credential,
+                connection_timeout=self.config["LLM_CONNECT_TIMEOUT"],
+                read_timeout=self.config["LLM_TIMEOUT"],
+            )
+        return self.async_client
+
+    async def acomplete(self, messages, **options):
+        response = await self.get_async_client().complete(**self.request(messages, options))
+        record_llm_usage(response.usage)
+        return response.choices[0].message.content.strip()
+
+    async def astream(self, messages, **options):
+        updates = await self.get_async_client().complete(stream=True, **self.request(messages, options))
+        async for update in updates:
+            text = chunk_text(update)
+            if text:
+                yield text
+
+    def close(self):
+        self.client.close()
+        self.session.close()
+
+    async def aclose(self):
+        if self.async_client is not None:
+            await self.async_client.close()
+            self.async_client = None
+
+
+class OpenAIBackend:
+    """OpenAI (or any OpenAI-compatible server, e.g. a local fake, via LLM_BASE_URL)."""
+
+    def __init__(self, config):
+        from openai import OpenAI
+        import httpx, urllib3
+        self.config = config
+        self.model = os.getenv("OPENAI_MODEL_NAME", "gpt-4o")
+        self.client_options = {"api_key": os.getenv("OPENAI_API_KEY"), "base_url": config["LLM_BASE_URL"]}
+        # SSL verification stays disabled as before for the corporate proxy.
+        self.http_client = httpx.Client(verify=False, **httpx_client_options(config))
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        self.client = OpenAI(http_client=self.http_client, **self.client_options)
+        self.async_client = None
+
+    def complete(self, messages, **options):
+        completion = self.client.chat.completions.create(model=self.model, messages=messages, **options)
+        record_llm_usage(completion.usage)
+        return completion.choices[0].message.content
+
+    # The final chunk carries the token usage when asked for it.
+    stream_options = {"stream": True, "stream_options": {"include_usage": True}}
+
+    def stream(self, messages, **options):
+        for chunk in self.client.chat.completions.create(model=self.model, messages=messages, **self.stream_options, **options):
+            text = chunk_text(chunk)
+            if text:
+                yield text
+
+    def get_async_client(self):
+        if self.async_client is None:
+            from openai import AsyncOpenAI
+            import httpx
+            self.async_client = AsyncOpenAI(
+                http_client=httpx.AsyncClient(verify=False, **httpx_client_options(self.config)), **self.client_options
+            )
+        return self.async_client
+
+    async def acomplete(self, messages, **options):
+        completion = await self.get_async_client().chat.completions.create(model=self.model, messages=messages, **options)
+        record_llm_usage(completion.usage)
+        return completion.choices[0].message.content
+
+    async def astream(self, messages, **options):
+        chunks = await self.get_async_client().chat.completions.create(model=self.model, messages=messages, **self.stream_options, **options)
+        async for chunk in chunks:
+            text = chunk_text(chunk)
+            if text:
+                yield text
+
+    def close(self):
+        self.http_client.close()
+
+    async def aclose(self):
+        if self.async_client is not None:
+            await self.async_client.close()
+            self.async_client = None
+
+
+backend_factories = {
+    "azure_openai": AzureOpenAIBackend,
+    "azure_inference": AzureInferenceBackend,
+    "openai": OpenAIBackend,
+}
+
+
+def register_backend(name, factory):
+    """Register a backend factory; it is called with llm_client_config and must return an object with complete(messages, **options)."""
+    backend_factories[name] = factory
+
+
+async def acomplete(client, messages, **options):
+    """Await client.acomplete, or run client.complete in a worker thread for sync-only backends."""
+    if hasattr(client, "acomplete"):
+        return await client.acomplete(messages, **options)
+    import asyncio
+    return await asyncio.to_thread(client.complete, messages, **options)
+
+
+def stream(client, messages, **options):
+    """Yield the completion as text deltas; backends without stream() yield it in one piece."""
+    if hasattr(client, "stream"):
+        yield from client.stream(messages, **options)
+    else:
+        yield client.complete(messages, **options)
+
+
+async def astream(client, messages, **options):
+    """Async version of stream(), falling back to acomplete for backends without astream()."""
+    if hasattr(client, "astream"):
+        async for text in client.astream(messages, **options):
+            yield text
+    else:
+        yield await acomplete(client, messages, **options)
+
+
+class LLMClientRegistry:
+    """Builds one client per model name on first use and hands out the same instance afterwards."""
+
+    def __init__(self, config=None):
+        self.config = config if config is not None else llm_client_config
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def backend_name(self, model_name):
+        return self.config["LLM_BACKEND"] or model_backends.get(model_name, model_backends["gpt-35-turbo"])
+
+    def get(self, model_name):
+        client = self._clients.get(model_name)
+        if client is not None:
+            return client
+        with self._lock:
+            client = self._clients.get(model_name)
+            if client is None:
+                client = backend_factories[self.backend_name(model_name)](self.config)
+                self._clients[model_name] = client
+        return client
+
+    def set_model_backend(self, model_name, backend_name):
+        """Route model_name to backend_name, dropping any client already built for it."""
+        with self._lock:
+            model_backends[model_name] = backend_name
+            self._discard(model_name)
+
+    def close(self):
+        with self._lock:
+            for model_name in list(self._clients):
+                self._discard(model_name)
+
+    async def aclose(self):
+        """Close the async clients; call before the event loop that created them shuts down."""
+        for client in list(self._clients.values()):
+            if hasattr(client, "aclose"):
+                await client.aclose()
+
+    def _discard(self, model_name):
+        client = self._clients.pop(model_name, None)
+        if client is not None and hasattr(client, "close"):
+            client.close()
+
+
+llm_clients = LLMClientRegistry()
+
+
+def get_llm_client(model_name):
+    return llm_clients.get(model_name)
+
+
+def close_llm_clients():
+    llm_clients.close()
+
+
+async def aclose_llm_clients():
+    await llm_clients.aclose()
@@ -1,10 +1,16 @@
-from openai import OpenAI, AzureOpenAI
-from azure.ai.inference import ChatCompletionsClient
-from azure.ai.inference.models import SystemMessage, UserMessage
-from azure.core.credentials import AzureKeyCredential
-import re, os, httpx, urllib3
-from neo4j import GraphDatabase
+import re, os, time
 from dotenv import load_dotenv
+from schema_cache import schema_cache
+from llm_clients import get_llm_client, close_llm_clients, stream
+from cypher_validator import check_candidate, format_validation_errors
+from query_executor import execute_read_query, describe_execution
+from prompt_context import encode_schema, encode_results
+from query_cache import cached_cypher, remember_cypher, cached_result, remember_result
+from index_manager import index_hint_message, refresh_index_status
+from entity_linker import link_entities, annotate_prompt, local_sanity_check
+from intent_templates import answer_from_template, record_llm_path
+from tracing import traced, current_span, record_llm_call, record_execution, start_metrics_server
+from answer_stream import answer_stream_config, emit, event_sink, stream_events, streaming
 
 env_path = 'knowledgegraph/neo4j_creds.env'
 load_dotenv(dotenv_path=env_path)
@@ -16,61 +22,132 @@ neo4j_config = {
 }
 
 # First function in main: main -> process_prompt
+# Each stage runs in a tracing span (see tracing.py) when TRACING_ENABLED=true
+# Returns the answer, or None when the question is not suitable for the graph; the query, rows and
+# answer tokens also go out as events to an answer_stream.py sink (see stream_prompt)
+@traced("process_prompt")
 def process_prompt(driver, user_prompt, max_tries,model_name):
+    started = time.perf_counter()
     schema = fetch_entity_and_relationships(driver)  # written
-    if(query_sanity_check(schema, user_prompt,model_name).lower() == "no"):
+    # Resolve entity mentions to exact stored names before anything else looks at the prompt
+    links = link_entities(driver, user_prompt, schema)
+    # Common question shapes are answered from a pre-validated template without any LLM call
+    template = answer_from_template(driver, user_prompt, schema, links)
+    if template:
+        match, execution, answer = template
+        current_span().set("template", match["template"]["intent"])
+        print(f"\nAnswered with the '{match['template']['intent']}' template:\n", match["query"])
+        emit("query", query=match["query"], source="template")
+        print(describe_execution(execution))
+        emit("rows", query=match["query"], rows=execution["rows"], truncated=execution["truncated"])
+        emit("token", text=answer)
+        print_answer(answer)
+        return answer
+    # A question already answered against this schema skips the sanity check and generation
+    cached_query = cached_cypher(user_prompt, schema, model_name)
+    if cached_query:
+        print("\nReusing cached Cypher Query:\n", cached_query)
+        emit("query", query=cached_query, source="cache")
+        results, truncated = run_query(cached_query, driver)
+        if results:
+            current_span().set("cache", "question")
+            answer = generate_response_from_kg_results(user_prompt, cached_query, results, schema,model_name, truncated)
+            print_answer(answer)
+            return answer
+    # A prompt that clearly fits the graph skips the LLM sanity check
+    generation_prompt = annotate_prompt(user_prompt, links)
+    if local_sanity_check(user_prompt, schema, links):
+        print("Sanity check passed locally.")
+    elif(query_sanity_check(schema, user_prompt,model_name).lower() == "no"):
+        current_span().set("feasible", False)
         print("Query not suitable. Please try again with a different query.")
         return None
     run_number = 1
     results = None
+    truncated = False
     invalid_query = ""
     while run_number <= max_tries:
-        raw_query = generate_cypher_query_from_prompt(user_prompt, schema, run_number, invalid_query, model_name)
+        raw_query = generate_cypher_query_from_prompt(generation_prompt, schema, run_number, invalid_query, model_name)
         candidate_query = extract_cypher_code(raw_query)
         print("\nGenerated Cypher Query:\n", candidate_query)
+        validation_feedback = ""
         if "error" in candidate_query.lower():
             invalid_query = invalid_query + "\n\n"
             run_number += 1
         else:
-            results = run_query(candidate_query, driver)
+            emit("query", query=candidate_query, source="generated")
+            # Reject write clauses and unknown labels/types/properties locally, before a round trip
+            validation_errors = check_candidate(candidate_query, schema, driver)
+            if validation_errors:
+                validation_feedback = "\nThis query was rejected before execution:\n" + format_validation_errors(validation_errors)
+                print(validation_feedback)
+                emit("rejected", query=candidate_query, feedback=validation_feedback.strip())
+                current_span().add("validation_rejections")
+                results = None
+            else:
+                results, truncated = run_query(candidate_query, driver)
         
         if results:
+            remember_cypher(user_prompt, schema, model_name, candidate_query)
             break  # Exit the loop if results are found
         else:
             run_number += 1
+            current_span().add("retries")
             print(f"No results found. Attempting again... (Attempt {run_number})")
-            invalid_query = invalid_query + "\n\n" + candidate_query
+            invalid_query = invalid_query + "\n\n" + candidate_query + validation_feedback
     
-    print(generate_response_from_kg_results(user_prompt, candidate_query, results, schema,model_name))
+    answer = generate_response_from_kg_results(user_prompt, candidate_query, results, schema,model_name, truncated)
+    print_answer(answer)
+    record_llm_path(time.perf_counter() - started)
+    return answer
+
+# Iterator form of process_prompt: yields the answer_stream.py events (the Cypher and rows as soon
+# as run_query has them, then the answer token by token) and finally {"type": "done", "answer", "feasible"}
+def stream_prompt(driver, user_prompt, max_tries, model_name):
+    return stream_events(
+        lambda: process_prompt(driver, user_prompt, max_tries, model_name),
+        lambda answer: {"answer": answer, "feasible": answer is not None},
+    )
 
 # Nested call: main -> process prompt -> 1. fetch_entity_and_relationships
-def fetch_entity_and_relationships(driver):
-    query = '''
-    MATCH (n)
-    OPTIONAL MATCH (n)-[r]->(m)
-    RETURN DISTINCT labels(n) AS entityTypes,
-                    keys(n) AS propertyKeys,
-                    type(r) AS relationshipType,
-                    labels(m) AS relatedEntityTypes
-    '''
-    schema = run_query(query,driver)
+# Served from the schema cache (memory, then disk); the graph is only introspected when the cache
+# is cold, expired, invalidated by the loader, or refresh=True.
+@traced("fetch_entity_and_relationships")
+def fetch_entity_and_relationships(driver, refresh=False):
+    schema = schema_cache.get(driver, refresh=refresh)
+    current_span().set("schema_rows", len(schema))
     return schema
 
-# 1. Nested call: main -> process prompt -> 1. fetch_entity_and_relationships -> run query
-# 2. Nested call: main -> process prompt -> run_query (to execute output query)
+# Nested call: main -> process prompt -> run_query (to execute output query)
+# Runs in a read transaction with a timeout, streaming records until the row/byte budget is hit;
+# results are cached per normalized query until the graph version changes. Returns (rows, truncated)
+@traced("run_query")
 def run_query(query, driver):
-    with driver.session() as session:
-        result = session.run(query)
-        rows = []
-        for record in result:
-            record_dict = dict(record)
-            rows.append(record_dict)
+    execution = cached_result(query)
+    cache_hit = execution is not None
+    if not cache_hit:
+        execution = execute_read_query(driver, query)
+        remember_result(query, execution)
+    else:
+        print("Served from the result cache.")
+    record_execution(execution, cache_hit)
+    emit("rows", query=query, rows=execution["rows"], truncated=execution["truncated"])
+    rows = execution["rows"]
     # print(rows)  # Print a new line
-    print(f"Number of records returned: {len(rows)}")  # Print the number of records
-    return rows
+    print(describe_execution(execution))  # Print the number of records, truncation and server timings
+    return rows, execution["truncated"]
 
 # 1. Nested call: main -> process prompt -> 2. query_sanity_check
+@traced("query_sanity_check")
 def query_sanity_check(schema,user_prompt,model_name):
+    messages = sanity_check_messages(schema, user_prompt)
+    output = query_llm(model_name,messages)
+
+    return output
+
+# Prompt for query_sanity_check, shared with the async pipeline
+def sanity_check_messages(schema, user_prompt):
+    schema = encode_schema(schema)
     messages =[
         {"role":"system","content":"You are a helpful, advanced language model that is well-versed with graph databases. Your primary goal is to help a user identify whether or not the query they are asking is feasible to answer or not."},
         {"role":"system","content":f"Refer: \n{schema}.\nTry your best to do a preliminary analysis of the request and determine based on the schema if this is a feasible question to try and answer using our graph database and querying. If any entities, properties or relationships appear, or seem to appear in the prompt, or any of the words closely associated with them appear, always permit the query to proceed. Be lenient with allowing queries to proceed."},
@@ -79,13 +156,19 @@ def query_sanity_check(schema,user_prompt,model_name):
     messages.append(
         {"role":"system","content":f"Here is the user prompt: {user_prompt}."}
     )
+    return messages
+
+# Nested call: main ->process prompt -> 2. generate_cypher_query_from_prompt
+@traced("generate_cypher_query")
+def generate_cypher_query_from_prompt(prompt, schema, run_number, invalid_query, model_name):
+    messages = cypher_generation_messages(prompt, schema, run_number, invalid_query)
     output = query_llm(model_name,messages)
 
     return output
 
-# Nested call: main ->process prompt -> 2. generate_cypher_query_from_prompt
-def generate_cypher_query_from_prompt(prompt, schema, run_number, invalid_query, model_name):
-    
+# Prompt for generate_cypher_query_from_prompt, shared with the async pipeline
+def cypher_generation_messages(prompt, schema, run_number, invalid_query):
+    schema = encode_schema(schema)
     messages = [
         {"role": "system", "content": "You are an advanced language model, expert at generating Cypher queries for a knowledge graph that encompasses various sectors, companies, raw materials, policies, regulations, and their interrelationships."},
         
@@ -93,7 +176,7 @@ def generate_cypher_query_from_prompt(prompt, schema, run_number, invalid_query,
         
         {"role": "system", "content": "DO NOT create any new nodes, entities, relationships apart from the ones provided."},
 
-        {"role": "system", "content": f"ONLY utilize the following node labels ('entityTypes'), their properties ('propertyKeys') and relationships ('relationshipType') which relate the entities to other entities ('relatedEntityTypes'): \n{schema}."},
+        {"role": "system", "content": f"ONLY utilize the following node labels, their properties and relationships which relate the entities to other entities. Each label is listed as `Label {{propertyKeys}}`, followed by one `-[:RELATIONSHIP_TYPE]-> RelatedLabel` line per outgoing relationship (with `{{propertyKeys}}` after the type when the relationship has properties): \n{schema}."},
 
         {"role": "system", "content": "Ideation and Exploration: 1. Decompose the user prompt into manageable steps. Identify words in the prompt that correspond to specific entities. Recognize variations in user language; map synonyms and related terms for clarity. Analyze each segment based on node labels, properties, and relationships. Investigate potential multi-hop chains formed by relationships and entities, decomposing the input as needed. Utilize both directed and undirected relationships for exploration, including undirected ones that may yield valuable insights. Reassemble the chunks to grasp the complete context as previously analyzed. 2. Understanding Relationships: Acknowledge the interconnected nature of entities within the knowledge graph. For instance, companies may be influenced by factors such as sourcing from countries and utilizing local raw materials. Consider all relevant relationships when formulating queries. 3. Multi-Hop Relationships: Recognize multi-hop relationships by tracing impacts through interconnected entities (e.g., from Mine to Country to Company to Raw Materials). If entities are identified in the prompt, explore their connections through the provided relationships. 4. General Context: Ensure that the system remains adaptable to various user inputs, maintaining clarity and coherence throughout the analysis process."},
 
@@ -103,16 +186,30 @@ def generate_cypher_query_from_prompt(prompt, schema, run_number, invalid_query,
 
         {"role": "system", "content": "5. Output Format: Provide the response as a directly executable Cypher query string. Do not return anything which is not part of the cypher query. For errors or no entries returned, return the response in the previously mentioned standardized format."},
     ]
+    index_hint = index_hint_message()
+    if index_hint:
+        messages.append(index_hint)
     messages.append(
         {"role": "user", "content": f"Generate a Cypher query for this user prompt: {prompt}. If run number =1, ignore the rest of this prompt. If {run_number} > 1, there was an error when I provided you with user prompt to generate a Cypher query in the the previous attempt. Since these did not achieve the goal, take them into consideration and avoid making the same mistakes, and modify your approach appropriately. Here is everything you have already tried so far in your previous attempts:{invalid_query}"}
     )
-
-    output = query_llm(model_name,messages)
-
-    return output
+    return messages
         
 # Nested call: main -> process_prompt -> generate_response_from_kg_results
-def generate_response_from_kg_results(user_prompt, candidate_query, results, schema,model_name):
+# Streamed token by token when an answer_stream.py sink is listening
+@traced("generate_response")
+def generate_response_from_kg_results(user_prompt, candidate_query, results, schema,model_name, truncated=False):
+    messages = kg_response_messages(user_prompt, candidate_query, results, schema, truncated)
+    if streaming():
+        output = stream_llm(model_name, messages)
+    else:
+        output = query_llm(model_name,messages)
+
+    return output
+
+# Prompt for generate_response_from_kg_results, shared with the async pipeline
+def kg_response_messages(user_prompt, candidate_query, results, schema, truncated=False):
+    schema = encode_schema(schema)
+    results = encode_results(results, truncated=truncated)
     messages = [
         {"role": "system", "content": "You are an advanced language model which is an expert at generating insights from various sectors, companies, raw materials, policies, regulations, and their interrelationships."},
         
@@ -121,90 +218,48 @@ def generate_response_from_kg_results(user_prompt, candidate_query, results, sch
     messages.append(
         {"role": "user", "content": f"My prompt was: {user_prompt}. \n The generated query was: {candidate_query}.\n The results of executing the query were: {results}.\n The schema of the knowledge graph was as follows:\n {schema}. Now explain to me what this means and."},
     )
-
-    output = query_llm(model_name,messages)
-
-    return output
+    return messages
 
 # Nested call: main ->process prompt -> 2. generate_cypher_query_from_prompt -> query_llm ->  query_gpt_35
+# The client comes from the registry in llm_clients.py and is reused across calls.
 def query_gpt_35(messages):
-    azure_35_config = {
-        "AZURE_OPENAI_ENDPOINT": os.getenv("AZURE_OPENAI_ENDPOINT"), 
-        "AZURE_OPENAI_MODEL_DEPLOYMENT_NAME": os.getenv("AZURE_OPENAI_MODEL_DEPLOYMENT_NAME"),
-        "AZURE_OPENAI_MODEL_NAME": os.getenv("AZURE_OPENAI_MODEL_NAME"),
-        "AZURE_OPENAI_API_KEY": os.getenv("AZURE_OPENAI_API_KEY"), 
-        "AZURE_OPENAI_API_VERSION": os.getenv("AZURE_OPENAI_API_VERSION")
-    }
-    # Initialize Azure OpenAI client
-    client_remote_35 = AzureOpenAI(
-        azure_endpoint=azure_35_config["AZURE_OPENAI_ENDPOINT"],
-        api_key=azure_35_config["AZURE_OPENAI_API_KEY"],
-        api_version=azure_35_config["AZURE_OPENAI_API_VERSION"]
-    )
-    response = client_remote_35.chat.completions.create(
-        model=azure_35_config["AZURE_OPENAI_MODEL_NAME"],
-        messages=messages
-    )
-    return response.choices[0].message.content.strip()
+    return get_llm_client("gpt-35-turbo").complete(messages)
 
 # Nested call: main ->process prompt -> 2. generate_cypher_query_from_prompt -> query_llm ->  query_gpt_4o
 def query_gpt_4o(messages):
-    azure_4o_config = {
-        "AZURE_OPENAI_ENDPOINT": os.getenv("AZURE_OPENAI_ENDPOINT_4o"), 
-        "AZURE_OPENAI_MODEL_NAME": os.getenv("AZURE_OPENAI_MODEL_NAME_4o"),
-        "AZURE_OPENAI_API_KEY": os.getenv("AZURE_OPENAI_API_KEY_4o")
-    }
-    client = ChatCompletionsClient(
-        endpoint=azure_4o_config["AZURE_OPENAI_ENDPOINT"],
-        credential=AzureKeyCredential(azure_4o_config["AZURE_OPENAI_API_KEY"]),
-    )
-    # Create a list to hold the message instances
-    all_messages = []
-
-    # Loop through the input messages and create the appropriate instances
-    for message in messages:
-        if message["role"] == "system":
-            all_messages.append(SystemMessage(content=message["content"]))
-        elif message["role"] == "user":
-            all_messages.append(UserMessage(content=message["content"]))
-
-    response = client.complete(
-        messages=all_messages,
-        max_tokens=4096,
-        temperature=1.0,
-        top_p=1.0,
-        model=azure_4o_config["AZURE_OPENAI_MODEL_NAME"]
-    )
-    return response.choices[0].message.content.strip()
+    return get_llm_client("gpt-4o").complete(messages)
 
 # Nested call: main ->process prompt -> 2. generate_cypher_query_from_prompt -> query_llm -> query_openai_model
 def query_openai_model(messages):
-    openai_config = {
-        "OPENAI_API_KEY":os.getenv("OPENAI_API_KEY")
-    }
-    # Configure OpenAI client with SSL verification disabled
-    client = OpenAI(
-        api_key=openai_config["OPENAI_API_KEY"],
-        http_client = httpx.Client(verify=False)
-    )
-    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-    # Make your API call
-    completion = client.chat.completions.create(
-        model="gpt-4o",
-        messages=messages
-    )
-    
-    return completion.choices[0].message.content
+    return get_llm_client("openai").complete(messages)
 
-def query_llm(model_name,messages):
+# Maps the model names accepted by query_llm onto llm_clients registry keys
+def llm_client_key(model_name):
     if model_name.lower() == 'gpt-35-turbo':
-        return query_gpt_35(messages)
+        return 'gpt-35-turbo'
     elif model_name.lower() == 'gpt-4o':
-        return query_gpt_4o(messages)
+        return 'gpt-4o'
     elif model_name.lower() == 'openai':
-        return query_gpt_4o(messages)
+        return 'gpt-4o'
     else:
-        return query_gpt_35(messages)
+        return 'gpt-35-turbo'
+
+@traced("query_llm")
+def query_llm(model_name,messages):
+    output = get_llm_client(llm_client_key(model_name)).complete(messages)
+    record_llm_call(model_name, messages, output)
+    return output
+
+# Emits each piece of the completion as a token event and returns the whole text
+@traced("query_llm")
+def stream_llm(model_name, messages):
+    parts = []
+    for text in stream(get_llm_client(llm_client_key(model_name)), messages):
+        parts.append(text)
+        emit("token", text=text)
+    output = "".join(parts).strip()
+    record_llm_call(model_name, messages, output)
+    return output
 
 # Nested call: main ->process prompt -> 3. extract_cypher_code
 def extract_cypher_code(text):
@@ -216,18 +271,38 @@ def extract_cypher_code(text):
         return "error"
     return text.strip()  # Return None if no match is found
 
+# A streamed answer has already gone out token by token; only its line is ended here
+def print_answer(answer):
+    if streaming():
+        print()
+    else:
+        print(answer)
+
+def print_tokens(event):
+    if event["type"] == "token":
+        print(event["text"], end="", flush=True)
+
 # Runs first
 def main():
+    from neo4j import GraphDatabase
     print("Connecting to Neo4j...")
     driver = GraphDatabase.driver(neo4j_config["NEO4J_URI"], auth=(neo4j_config["NEO4J_USERNAME"], neo4j_config["NEO4J_PASSWORD"]))
     print("Connected to instance!")
+    start_metrics_server()
+    refresh_index_status(driver)
     max_tries = 10
     model_name = 'gpt-35'
     try:
         user_prompt = input("\nPlease enter your question: ").strip()
-        process_prompt(driver, user_prompt, max_tries,model_name)
+        if answer_stream_config["STREAM_ANSWERS"]:
+            # The query and rows are printed as they come; the answer is printed while it is generated
+            with event_sink(print_tokens):
+                process_prompt(driver, user_prompt, max_tries,model_name)
+        else:
+            process_prompt(driver, user_prompt, max_tries,model_name)
     finally:
         driver.close()
+        close_llm_clients()
         print("\nClosed Neo4j connection.")
 
 if __name__ == '__main__':
@@ -0,0 +1,149 @@
+import json, os
+from collections import Counter
+from dotenv import load_dotenv
+
+env_path = 'knowledgegraph/neo4j_creds.env'
+load_dotenv(dotenv_path=env_path)
+
+# Compact, token-budgeted text for the schema and query results that go into the LLM prompts.
+# The schema is grouped by label (one line per label with its property keys, one line per outgoing
+# relationship type) instead of the repr of one row per (labels, keys, rel, labels) combination,
+# and results become a deduplicated table. Anything over its budget is cut down: results keep an
+# evenly spaced sample of rows plus per-column aggregates so the LLM still sees the whole picture.
+
+prompt_context_config = {
+    "PROMPT_SCHEMA_TOKEN_BUDGET": int(os.getenv("PROMPT_SCHEMA_TOKEN_BUDGET", "2000")),
+    "PROMPT_RESULTS_TOKEN_BUDGET": int(os.getenv("PROMPT_RESULTS_TOKEN_BUDGET", "1500")),
+}
+
+_encoding = None
+_encoding_loaded = False
+
+
+def get_encoding():
+    # Loaded on first use: importing tiktoken and building the encoding costs more than the rest of startup.
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:  # tiktoken is optional; fall back to the ~4 characters per token rule of thumb
+            _encoding = None
+        _encoding_loaded = True
+    return _encoding
+
+
+def count_tokens(text):
+    encoding = get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return len(text) // 4 + 1
+
+
+def fit_lines(lines, token_budget, noun):
+    """Keep as many leading lines as fit the budget and say how many were left out."""
+    kept = []
+    used = 0
+    for index, line in enumerate(lines):
+        cost = count_tokens(line) + 1
+        if used + cost > token_budget:
+            kept.append(f"... {len(lines) - index} more {noun} omitted to fit the prompt budget")
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(kept)
+
+
+_schema_memo = (None, None, None)
+
+
+def encode_schema(schema, token_budget=None):
+    """Render schema rows from fetch_entity_and_relationships as `Label {keys}` / `  -[:TYPE {keys}]-> Label` lines."""
+    global _schema_memo
+    token_budget = token_budget if token_budget is not None else prompt_context_config["PROMPT_SCHEMA_TOKEN_BUDGET"]
+    # The schema cache hands out the same list while it is warm, so re-encoding is skipped.
+    if _schema_memo[0] is schema and _schema_memo[1] == token_budget:
+        return _schema_memo[2]
+    labels = {}
+    for row in schema or ():
+        label = ":".join(row.get("entityTypes") or ())
+        entry = labels.setdefault(label, {"keys": set(), "relationships": {}})
+        entry["keys"].update(row.get("propertyKeys") or ())
+        if row.get("relationshipType"):
+            related, keys = entry["relationships"].setdefault(row["relationshipType"], (set(), set()))
+            related.add(":".join(row.get("relatedEntityTypes") or ()))
+            keys.update(row.get("relationshipPropertyKeys") or ())
+    lines = []
+    for label in sorted(labels):
+        entry = labels[label]
+        lines.append(f"{label} {{{', '.join(sorted(entry['keys']))}}}")
+        for relationship_type in sorted(entry["relationships"]):
+            related, keys = entry["relationships"][relationship_type]
+            properties = f" {{{', '.join(sorted(keys))}}}" if keys else ""
+            lines.append(f"  -[:{relationship_type}{properties}]-> {' | '.join(sorted(related))}")
+    text = fit_lines(lines, token_budget, "schema lines")
+    _schema_memo = (schema, token_budget, text)
+    return text
+
+
+def format_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value.replace("|", "/").replace("\n", " ")
+    if isinstance(value, (list, tuple)):
+        return ", ".join(format_value(item) for item in value)
+    return json.dumps(value, default=str, sort_keys=True)
+
+
+def results_table(columns, rows):
+    lines = [" | ".join(columns)]
+    lines.extend(" | ".join(format_value(row.get(column)) for column in columns) for row in rows)
+    return "\n".join(lines)
+
+
+def aggregate_summary(columns, rows):
+    lines = []
+    for column in columns:
+        counts = Counter(format_value(row.get(column)) for row in rows)
+        top = ", ".join(f"{value} ({count})" for value, count in counts.most_common(5))
+        lines.append(f"{column}: {len(counts)} distinct; most frequent: {top}")
+    return "\n".join(lines)
+
+
+def evenly_spaced(rows, count):
+    if count >= len(rows):
+        return rows
+    step = len(rows) / count
+    return [rows[int(index * step)] for index in range(count)]
+
+
+def encode_results(results, token_budget=None, truncated=False):
+    """Render query rows as a deduplicated table; over budget, a row sample plus per-column aggregates."""
+    token_budget = token_budget if token_budget is not None else prompt_context_config["PROMPT_RESULTS_TOKEN_BUDGET"]
+    if not results:
+        return "No rows returned."
+    rows = list({json.dumps(row, default=str, sort_keys=True): row for row in results}.values())
+    columns = list(dict.fromkeys(column for row in rows for column in row))
+    note = f"{len(rows)} distinct rows"
+    if len(rows) != len(results):
+        note += f" ({len(results)} before removing duplicates)"
+    if truncated:
+        note += "; the query returned more rows than the execution budget allowed"
+    text = f"{note}:\n{results_table(columns, rows)}"
+    if count_tokens(text) <= token_budget:
+        return text
+
+    summary = f"{note}. Column summary:\n{aggregate_summary(columns, rows)}"
+    # Largest evenly spaced sample that still fits next to the summary.
+    low, high = 0, len(rows)
+    while low < high:
+        middle = (low + high + 1) // 2
+        candidate = f"{summary}\nSample of {middle} rows:\n{results_table(columns, evenly_spaced(rows, middle))}"
+        if count_tokens(candidate) <= token_budget:
+            low = middle
+        else:
+            high = middle - 1
+    if low == 0:
+        return fit_lines(summary.split("\n"), token_budget, "summary lines")
+    return f"{summary}\nSample of {low} rows:\n{results_table(columns, evenly_spaced(rows, low))}"
@@ -0,0 +1,179 @@
+import atexit, hashlib, json, os, re, threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+from graph_version import current_graph_version
+from cypher_validator import tokenize
+
+env_path = 'knowledgegraph/neo4j_creds.env'
+load_dotenv(dotenv_path=env_path)
+
+# Two-level cache in front of the pipeline. The question cache maps a normalized question plus
+# a schema fingerprint and model name to the Cypher query that answered it, skipping the sanity
+# check and the generation loop; the result cache maps a normalized Cypher query to its execution
+# result, skipping the Neo4j round trip. Both are LRU with an entry and a byte limit, can persist
+# to QUERY_CACHE_DIR, and drop entries recorded under an older graph version.
+
+query_cache_config = {
+    "QUERY_CACHE_ENABLED": os.getenv("QUERY_CACHE_ENABLED", "true").lower() == "true",
+    "QUERY_CACHE_DIR": os.getenv("QUERY_CACHE_DIR"),
+    "QUESTION_CACHE_MAX_ENTRIES": int(os.getenv("QUESTION_CACHE_MAX_ENTRIES", "5000")),
+    "RESULT_CACHE_MAX_ENTRIES": int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1000")),
+    "RESULT_CACHE_MAX_BYTES": int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+}
+
+
+class LRUCache:
+    """Thread-safe LRU keyed by strings; values must be JSON-serializable and are tagged with the graph version."""
+
+    def __init__(self, max_entries, max_bytes=None, path=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (graph version, size, value)
+        self._bytes = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+            atexit.register(self.flush)
+
+    def get(self, key):
+        version = current_graph_version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] != version:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, value):
+        size = len(json.dumps(value, default=str))
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (current_graph_version(), size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (self.max_bytes is not None and self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+            self._dirty = True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._dirty = True
+
+    def flush(self):
+        """Write the cache to its file (no-op without a path or when nothing changed)."""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = [[key, version, value] for key, (version, size, value) in self._entries.items()]
+            self._dirty = False
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entries, f, default=str)
+        os.replace(tmp_path, self.path)
+
+    def _remove(self, key):
+        version, size, value = self._entries.pop(key)
+        self._bytes -= size
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        version = current_graph_version()
+        for key, entry_version, value in entries:
+            if entry_version == version:
+                size = len(json.dumps(value, default=str))
+                self._entries[key] = (entry_version, size, value)
+                self._bytes += size
+
+
+def normalize_question(question):
+    """Casefold, drop punctuation and collapse whitespace so near-identical phrasings share a key."""
+    return " ".join(re.sub(r"[^\w\s]", " ", question.casefold()).split())
+
+
+def normalize_cypher(query):
+    """Drop comments and layout differences; string literals and identifiers keep their case."""
+    return " ".join(text for kind, text in tokenize(query))
+
+
+_fingerprint_memo = (None, None)
+
+
+def schema_fingerprint(schema):
+    global _fingerprint_memo
+    if _fingerprint_memo[0] is schema:
+        return _fingerprint_memo[1]
+    fingerprint = hashlib.sha1(json.dumps(schema, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    _fingerprint_memo = (schema, fingerprint)
+    return fingerprint
+
+
+def question_key(question, schema, model_name):
+    return f"{model_name.lower()}|{schema_fingerprint(schema)}|{normalize_question(question)}"
+
+
+def cache_path(name):
+    directory = query_cache_config["QUERY_CACHE_DIR"]
+    return os.path.join(directory, name) if directory else None
+
+
+question_cache = LRUCache(query_cache_config["QUESTION_CACHE_MAX_ENTRIES"], path=cache_path("question_cache.json"))
+result_cache = LRUCache(
+    query_cache_config["RESULT_CACHE_MAX_ENTRIES"],
+    max_bytes=query_cache_config["RESULT_CACHE_MAX_BYTES"],
+    path=cache_path("result_cache.json"),
+)
+
+
+def cached_cypher(question, schema, model_name):
+    """The Cypher query that previously answered this question against this schema, or None."""
+    if not query_cache_config["QUERY_CACHE_ENABLED"]:
+        return None
+    return question_cache.get(question_key(question, schema, model_name))
+
+
+def remember_cypher(question, schema, model_name, query):
+    if query_cache_config["QUERY_CACHE_ENABLED"]:
+        question_cache.put(question_key(question, schema, model_name), query)
+
+
+def result_key(query, params=None):
+    key = normalize_cypher(query)
+    return f"{key}|{json.dumps(params, sort_keys=True, default=str)}" if params else key
+
+
+def cached_result(query, params=None):
+    if not query_cache_config["QUERY_CACHE_ENABLED"]:
+        return None
+    return result_cache.get(result_key(query, params))
+
+
+def remember_result(query, execution, params=None):
+    if query_cache_config["QUERY_CACHE_ENABLED"]:
+        result_cache.put(result_key(query, params), execution)
+
+
+def cache_stats():
+    return {
+        "question_cache": {"hits": question_cache.hits, "misses": question_cache.misses, "entries": len(question_cache._entries)},
+        "result_cache": {"hits": result_cache.hits, "misses": result_cache.misses, "entries": len(result_cache._entries)},
+    }
@@ -0,0 +1,135 @@
+import json, os
+from dotenv import load_dotenv
+
+env_path = 'knowledgegraph/neo4j_creds.env'
+load_dotenv(dotenv_path=env_path)
+
+# Guarded execution for LLM-generated queries. Queries run in read transactions (routed to
+# readers, and refused by the server if they try to write) with a transaction timeout, records are
+# pulled lazily in fetch_size batches, and reading stops once a row or byte budget is reached; the
+# rest of the stream is discarded on the server. The result reports whether it was truncated and
+# the server timings from the result summary.
+
+query_execution_config = {
+    "QUERY_TIMEOUT": float(os.getenv("QUERY_TIMEOUT", "30")),
+    "QUERY_FETCH_SIZE": int(os.getenv("QUERY_FETCH_SIZE", "500")),
+    "QUERY_MAX_ROWS": int(os.getenv("QUERY_MAX_ROWS", "1000")),
+    "QUERY_MAX_BYTES": int(os.getenv("QUERY_MAX_BYTES", "1000000")),
+}
+
+
+def summary_stats(summary):
+    return {
+        "result_available_after": summary.result_available_after,
+        "result_consumed_after": summary.result_consumed_after,
+    }
+
+
+def stream_read_query(driver, query, params=None, timeout=None, fetch_size=None, stats=None):
+    """Yield rows lazily from a read transaction; stats (if given) gets the server timings once the stream is exhausted or closed."""
+    from neo4j import READ_ACCESS
+    timeout = timeout if timeout is not None else query_execution_config["QUERY_TIMEOUT"]
+    fetch_size = fetch_size if fetch_size is not None else query_execution_config["QUERY_FETCH_SIZE"]
+    with driver.session(default_access_mode=READ_ACCESS, fetch_size=fetch_size) as session:
+        tx = session.begin_transaction(timeout=timeout)
+        try:
+            result = tx.run(query, params or {})
+            try:
+                for record in result:
+                    yield record.data()
+            finally:
+                # Discards whatever the consumer did not read and returns the summary.
+                summary = result.consume()
+                if stats is not None:
+                    stats.update(summary_stats(summary))
+        finally:
+            tx.close()
+
+
+async def stream_read_query_async(driver, query, params=None, timeout=None, fetch_size=None, stats=None):
+    """stream_read_query for a neo4j AsyncDriver."""
+    from neo4j import READ_ACCESS
+    timeout = timeout if timeout is not None else query_execution_config["QUERY_TIMEOUT"]
+    fetch_size = fetch_size if fetch_size is not None else query_execution_config["QUERY_FETCH_SIZE"]
+    async with driver.session(default_access_mode=READ_ACCESS, fetch_size=fetch_size) as session:
+        tx = await session.begin_transaction(timeout=timeout)
+        try:
+            result = await tx.run(query, params or {})
+            try:
+                async for record in result:
+                    yield record.data()
+            finally:
+                summary = await result.consume()
+                if stats is not None:
+                    stats.update(summary_stats(summary))
+        finally:
+            await tx.close()
+
+
+class RowBudget:
+    """Tracks rows and serialized bytes against the limits; add() returns False once a row would exceed them."""
+
+    def __init__(self, max_rows=None, max_bytes=None):
+        self.max_rows = max_rows if max_rows is not None else query_execution_config["QUERY_MAX_ROWS"]
+        self.max_bytes = max_bytes if max_bytes is not None else query_execution_config["QUERY_MAX_BYTES"]
+        self.rows = []
+        self.bytes = 0
+        self.truncated_by = None
+
+    def add(self, row):
+        if len(self.rows) >= self.max_rows:
+            self.truncated_by = "max_rows"
+            return False
+        size = len(json.dumps(row, default=str))
+        if self.bytes + size > self.max_bytes:
+            self.truncated_by = "max_bytes"
+            return False
+        self.rows.append(row)
+        self.bytes += size
+        return True
+
+    def result(self, stats):
+        return {
+            "rows": self.rows,
+            "truncated": self.truncated_by is not None,
+            "truncated_by": self.truncated_by,
+            "bytes": self.bytes,
+            **stats,
+        }
+
+
+def execute_read_query(driver, query, params=None, max_rows=None, max_bytes=None, timeout=None, fetch_size=None):
+    """Run a query under the row/byte budget; returns rows, truncation info and server timings (ms)."""
+    budget = RowBudget(max_rows, max_bytes)
+    stats = {}
+    stream = stream_read_query(driver, query, params, timeout, fetch_size, stats)
+    try:
+        for row in stream:
+            if not budget.add(row):
+                break
+    finally:
+        stream.close()
+    return budget.result(stats)
+
+
+async def execute_read_query_async(driver, query, params=None, max_rows=None, max_bytes=None, timeout=None, fetch_size=None):
+    budget = RowBudget(max_rows, max_bytes)
+    stats = {}
+    stream = stream_read_query_async(driver, query, params, timeout, fetch_size, stats)
+    try:
+        async for row in stream:
+            if not budget.add(row):
+                break
+    finally:
+        await stream.aclose()
+    return budget.result(stats)
+
+
+def describe_execution(execution):
+    """One-line report of row count, truncation and server timings."""
+    text = f"Number of records returned: {len(execution['rows'])}"
+    if execution["truncated"]:
+        text += f" (truncated by {execution['truncated_by']})"
+    if execution.get("result_available_after") is not None:
+        text += f"; server: available after {execution['result_available_after']} ms, consumed after {execution['result_consumed_after']} ms"
+    return text
@@ -0,0 +1,261 @@
+import json, os, time
+from dotenv import load_dotenv
+from graph_version import current_graph_version
+
+env_path = 'knowledgegraph/neo4j_creds.env'
+load_dotenv(dotenv_path=env_path)
+
+# Schema summary used by the prompts in main_project_code.py. Labels and relationship types come
+# from the catalog procedures, and property keys of nodes and of relationships from
+# db.schema.nodeTypeProperties / db.schema.relTypeProperties, which cover every key in the store
+# rather than the first nodes of each label. The labels a relationship type connects are read from
+# the count store: (:A)-[:T]->() and ()-[:T]->(:B) counts are answered without a scan, and only a
+# type with several start and several end labels needs a LIMIT 1 existence check per label pair.
+# The summary is kept in memory and on disk and rebuilt once the TTL expires or the loader bumps
+# the graph version.
+
+schema_cache_config = {
+    "SCHEMA_CACHE_PATH": os.getenv("SCHEMA_CACHE_PATH", ".cache/schema_cache.json"),
+    "SCHEMA_CACHE_TTL": float(os.getenv("SCHEMA_CACHE_TTL", "3600")),
+}
+
+# Bookkeeping properties written by bulk_loader.py; they mean nothing to the LLM.
+HIDDEN_PROPERTY_KEYS = {"dataset"}
+
+LABELS_QUERY = "CALL db.labels() YIELD label RETURN label"
+RELATIONSHIP_TYPES_QUERY = "CALL db.relationshipTypes() YIELD relationshipType RETURN relationshipType"
+NODE_PROPERTIES_QUERY = "CALL db.schema.nodeTypeProperties() YIELD nodeLabels, propertyName RETURN nodeLabels, propertyName"
+RELATIONSHIP_PROPERTIES_QUERY = "CALL db.schema.relTypeProperties() YIELD relType, propertyName RETURN relType, propertyName"
+OUTGOING_COUNT_QUERY = "MATCH (:{label})-[:{rel_type}]->() RETURN count(*) AS count"
+INCOMING_COUNT_QUERY = "MATCH ()-[:{rel_type}]->(:{label}) RETURN count(*) AS count"
+ENDPOINT_EXISTS_QUERY = "MATCH (:{start})-[:{rel_type}]->(:{end}) RETURN true AS exists LIMIT 1"
+
+
+def quote_identifier(name):
+    """Backtick-quote a label or relationship type for interpolation into Cypher."""
+    return "`" + name.replace("`", "``") + "`"
+
+
+def relationship_type_name(rel_type):
+    """db.schema.relTypeProperties reports types as ":`TYPE`"; return the bare TYPE."""
+    name = rel_type[1:] if rel_type.startswith(":") else rel_type
+    if len(name) > 1 and name.startswith("`") and name.endswith("`"):
+        name = name[1:-1].replace("``", "`")
+    return name
+
+
+def collect_property_keys(node_rows, relationship_rows):
+    """Property keys per label and per relationship type from the two schema procedures."""
+    node_keys, relationship_keys = {}, {}
+    for row in node_rows:
+        for label in row["nodeLabels"] or ():
+            keys = node_keys.setdefault(label, set())
+            if row["propertyName"] and row["propertyName"] not in HIDDEN_PROPERTY_KEYS:
+                keys.add(row["propertyName"])
+    for row in relationship_rows:
+        keys = relationship_keys.setdefault(relationship_type_name(row["relType"]), set())
+        if row["propertyName"] and row["propertyName"] not in HIDDEN_PROPERTY_KEYS:
+            keys.add(row["propertyName"])
+    return node_keys, relationship_keys
+
+
+def endpoint_count_queries(labels, relationship_types):
+    """(direction, label, relationship type, query) for every count-store lookup of the endpoints."""
+    queries = []
+    for relationship_type in relationship_types:
+        for label in labels:
+            names = {"label": quote_identifier(label), "rel_type": quote_identifier(relationship_type)}
+            queries.append(("out", label, relationship_type, OUTGOING_COUNT_QUERY.format(**names)))
+            queries.append(("in", label, relationship_type, INCOMING_COUNT_QUERY.format(**names)))
+    return queries
+
+
+def endpoint_candidates(counts):
+    """Split {(direction, label, type): count} into known (start, type, end) triples and ones to check."""
+    starts, ends = {}, {}
+    for (direction, label, relationship_type), count in counts.items():
+        if count:
+            (starts if direction == "out" else ends).setdefault(relationship_type, []).append(label)
+    known, unverified = [], []
+    for relationship_type, start_labels in starts.items():
+        end_labels = ends.get(relationship_type, [])
+        # With a single start (or end) label every relationship of the type starts (ends) there,
+        # so each label on the other side is a real endpoint pair.
+        target = known if len(start_labels) == 1 or len(end_labels) == 1 else unverified
+        target.extend((start, relationship_type, end) for start in start_labels for end in end_labels)
+    return known, unverified
+
+
+def endpoint_exists_query(start, relationship_type, end):
+    return ENDPOINT_EXISTS_QUERY.format(
+        start=quote_identifier(start), rel_type=quote_identifier(relationship_type), end=quote_identifier(end)
+    )
+
+
+def build_schema_rows(node_keys, relationship_keys, endpoints):
+    """Assemble the introspected keys and endpoints into the entityTypes/propertyKeys/relationshipType/relatedEntityTypes shape."""
+    property_keys = {label: set(keys) for label, keys in node_keys.items()}
+    outgoing = {}
+    for start, relationship_type, end in endpoints:
+        outgoing.setdefault(start, set()).add((relationship_type, end))
+        property_keys.setdefault(start, set())
+        property_keys.setdefault(end, set())
+
+    schema = []
+    for label in sorted(property_keys):
+        keys = sorted(property_keys[label])
+        relationships = sorted(outgoing.get(label, ()))
+        if not relationships:
+            schema.append({
+                "entityTypes": [label],
+                "propertyKeys": keys,
+                "relationshipType": None,
+                "relationshipPropertyKeys": None,
+                "relatedEntityTypes": None,
+            })
+        for relationship_type, end in relationships:
+            schema.append({
+                "entityTypes": [label],
+                "propertyKeys": keys,
+                "relationshipType": relationship_type,
+                "relationshipPropertyKeys": sorted(relationship_keys.get(relationship_type, ())),
+                "relatedEntityTypes": [end],
+            })
+    return schema
+
+
+def introspect_schema(driver):
+    """Build the schema summary from the catalog and schema procedures plus count-store lookups."""
+    with driver.session() as session:
+        labels = [record["label"] for record in session.run(LABELS_QUERY)]
+        relationship_types = [record["relationshipType"] for record in session.run(RELATIONSHIP_TYPES_QUERY)]
+        node_keys, relationship_keys = collect_property_keys(
+            [record.data() for record in session.run(NODE_PROPERTIES_QUERY)],
+            [record.data() for record in session.run(RELATIONSHIP_PROPERTIES_QUERY)],
+        )
+        counts = {}
+        for direction, label, relationship_type, query in endpoint_count_queries(labels, relationship_types):
+            counts[(direction, label, relationship_type)] = sum(record["count"] for record in session.run(query))
+        endpoints, unverified = endpoint_candidates(counts)
+        for start, relationship_type, end in unverified:
+            if list(session.run(endpoint_exists_query(start, relationship_type, end))):
+                endpoints.append((start, relationship_type, end))
+    return build_schema_rows(node_keys, relationship_keys, endpoints)
+
+
+async def introspect_schema_async(driver):
+    """introspect_schema for a neo4j AsyncDriver."""
+    async with driver.session() as session:
+        result = await session.run(LABELS_QUERY)
+        labels = [record["label"] async for record in result]
+        result = await session.run(RELATIONSHIP_TYPES_QUERY)
+        relationship_types = [record["relationshipType"] async for record in result]
+        result = await session.run(NODE_PROPERTIES_QUERY)
+        node_rows = [record.data() async for record in result]
+        result = await session.run(RELATIONSHIP_PROPERTIES_QUERY)
+        relationship_rows = [record.data() async for record in result]
+        node_keys, relationship_keys = collect_property_keys(node_rows, relationship_rows)
+        counts = {}
+        for direction, label, relationship_type, query in endpoint_count_queries(labels, relationship_types):
+            result = await session.run(query)
+            counts[(direction, label, relationship_type)] = sum([record["count"] async for record in result])
+        endpoints, unverified = endpoint_candidates(counts)
+        for start, relationship_type, end in unverified:
+            result = await session.run(endpoint_exists_query(start, relationship_type, end))
+            if [record async for record in result]:
+                endpoints.append((start, relationship_type, end))
+    return build_schema_rows(node_keys, relationship_keys, endpoints)
+
+
+class SchemaCache:
+    """In-memory + on-disk cache of the schema summary with a TTL and explicit invalidation."""
+
+    def __init__(self, path=None, ttl=None):
+        self.path = path if path is not None else schema_cache_config["SCHEMA_CACHE_PATH"]
+        self.ttl = ttl if ttl is not None else schema_cache_config["SCHEMA_CACHE_TTL"]
+        self._entries = {}
+
+    def get(self, driver, refresh=False):
+        schema = None if refresh else self.cached()
+        if schema is None:
+            schema = introspect_schema(driver)
+            self.put(schema)
+        return schema
+
+    async def get_async(self, driver, refresh=False):
+        schema = None if refresh else self.cached()
+        if schema is None:
+            schema = await introspect_schema_async(driver)
+            self.put(schema)
+        return schema
+
+    def cached(self):
+        """Return the warm schema from memory or disk, or None if it has to be rebuilt."""
+        key = self._key()
+        schema = self._load_memory(key)
+        if schema is None:
+            schema = self._load_disk(key)
+        return schema
+
+    def put(self, schema):
+        key = self._key()
+        created_at = time.time()
+        self._entries = {key: (created_at, schema, self._store_disk(key, created_at, schema))}
+
+    def invalidate(self):
+        """Drop the cached schema now; writers normally just call bump_graph_version instead."""
+        self._entries.clear()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _key(self):
+        # Keyed on the database URI so one cache file never serves another database's schema, and
+        # on the graph version so a loader bump makes the cached schema stale.
+        return f"{os.getenv('NEO4J_URI', '')}@{current_graph_version()}"
+
+    def _expired(self, created_at):
+        return time.time() - created_at > self.ttl
+
+    def _disk_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime
+        except (OSError, TypeError):
+            return None
+
+    def _load_memory(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        created_at, schema, disk_mtime = entry
+        # A missing or rewritten cache file means another process (the loader) invalidated it.
+        if self._expired(created_at) or (self.path and self._disk_mtime() != disk_mtime):
+            del self._entries[key]
+            return None
+        return schema
+
+    def _load_disk(self, key):
+        if not self.path:
+            return None
+        disk_mtime = self._disk_mtime()
+        try:
+            with open(self.path) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached.get("key") != key or self._expired(cached.get("created_at", 0)):
+            return None
+        self._entries[key] = (cached["created_at"], cached["schema"], disk_mtime)
+        return cached["schema"]
+
+    def _store_disk(self, key, created_at, schema):
+        if not self.path:
+            return None
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"key": key, "created_at": created_at, "schema": schema}, f)
+        os.replace(tmp_path, self.path)
+        return self._disk_mtime()
+
+
+schema_cache = SchemaCache()
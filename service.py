@@ -0,0 +1,332 @@
+import asyncio, concurrent.futures, contextlib, json, os, queue, signal, sys, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+
+env_path = 'knowledgegraph/neo4j_creds.env'
+load_dotenv(dotenv_path=env_path)
+
+# Long-running HTTP/JSON front end for the question pipeline. One process keeps the Neo4j driver
+# pool, the schema cache, the entity index and the LLM clients warm, and answers questions with
+# process_prompt_async on a single event loop thread; HTTP requests are accepted on handler threads
+# and handed to that loop.
+#
+#   POST /ask      {"question": "...", "model": "gpt-35", "max_tries": 10, "candidates": 1, "selection": "first"}
+#                  with "stream": true the reply is NDJSON, one answer_stream.py event per line: the
+#                  Cypher and rows as soon as they exist, then the answer token by token, then "done"
+#   GET  /healthz  200 while the process is up
+#   GET  /readyz   200 once warm-up finished, 503 while warming up or draining
+#   GET  /stats    in-flight/queued/served/rejected counters plus cache and template stats
+#   GET  /metrics  Prometheus text from tracing.py (TRACING_ENABLED=true)
+#
+# Admission control: at most SERVICE_CONCURRENCY questions run at once and SERVICE_QUEUE_LIMIT more
+# may wait; beyond that requests get 429 with Retry-After right away instead of piling up, and a
+# question that takes longer than SERVICE_REQUEST_TIMEOUT is cancelled with 504. max_tries (up to
+# SERVICE_MAX_TRIES) and candidates (up to SERVICE_MAX_CANDIDATES) are checked before admission, so
+# one request can't fan out more LLM calls than that; out-of-range values get 400. The pipeline
+# modules (and through them the Neo4j and LLM SDKs) are imported during warm-up, after the port is
+# already listening, so /healthz answers immediately.
+
+service_config = {
+    "SERVICE_HOST": os.getenv("SERVICE_HOST", "127.0.0.1"),
+    "SERVICE_PORT": int(os.getenv("SERVICE_PORT", "8080")),
+    "SERVICE_CONCURRENCY": int(os.getenv("SERVICE_CONCURRENCY", "8")),
+    "SERVICE_QUEUE_LIMIT": int(os.getenv("SERVICE_QUEUE_LIMIT", "32")),
+    "SERVICE_REQUEST_TIMEOUT": float(os.getenv("SERVICE_REQUEST_TIMEOUT", "120")),
+    "SERVICE_MODEL": os.getenv("SERVICE_MODEL", "gpt-35"),
+    "SERVICE_MAX_TRIES": int(os.getenv("SERVICE_MAX_TRIES", "10")),
+    "SERVICE_MAX_CANDIDATES": int(os.getenv("SERVICE_MAX_CANDIDATES", "4")),
+    "SERVICE_MAX_BODY_BYTES": int(os.getenv("SERVICE_MAX_BODY_BYTES", "65536")),
+}
+
+
+class Overloaded(Exception):
+    pass
+
+
+class NotReady(Exception):
+    pass
+
+
+class QuestionService:
+    """Owns the event loop thread, the warm driver and the admission counters."""
+
+    def __init__(self, config=None, driver=None):
+        self.config = config if config is not None else service_config
+        self.driver = driver
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="question-loop", daemon=True)
+        self.ready = False
+        self.draining = False
+        self.warmup_error = None
+        self.running = 0
+        self.queued = 0
+        self.served = 0
+        self.rejected = 0
+        self.failed = 0
+        self._slots = None
+
+    def start(self):
+        self.thread.start()
+        return asyncio.run_coroutine_threadsafe(self.warm_up(), self.loop)
+
+    async def warm_up(self):
+        try:
+            from main_project_code import neo4j_config, llm_client_key
+            from async_pipeline import fetch_entity_and_relationships_async
+            from index_manager import refresh_index_status_async
+            from entity_linker import entity_linker
+            from llm_clients import get_llm_client
+            if self.driver is None:
+                from neo4j import AsyncGraphDatabase
+                self.driver = AsyncGraphDatabase.driver(
+                    neo4j_config["NEO4J_URI"], auth=(neo4j_config["NEO4J_USERNAME"], neo4j_config["NEO4J_PASSWORD"])
+                )
+                await self.driver.verify_connectivity()
+            await refresh_index_status_async(self.driver)
+            await fetch_entity_and_relationships_async(self.driver)
+            await entity_linker.get_async(self.driver)
+            get_llm_client(llm_client_key(self.config["SERVICE_MODEL"]))
+            self._slots = asyncio.Semaphore(self.config["SERVICE_CONCURRENCY"])
+            self.ready = True
+            print(f"Ready on http://{self.config['SERVICE_HOST']}:{self.config['SERVICE_PORT']}", file=sys.stderr)
+        except Exception as e:
+            self.warmup_error = repr(e)
+            print(f"Warm-up failed: {e!r}", file=sys.stderr)
+
+    def is_ready(self):
+        return self.ready and not self.draining
+
+    @contextlib.asynccontextmanager
+    async def admitted(self):
+        # Runs on the loop thread, so the counters need no lock.
+        if not self.is_ready():
+            raise NotReady()
+        if self.running + self.queued >= self.config["SERVICE_CONCURRENCY"] + self.config["SERVICE_QUEUE_LIMIT"]:
+            self.rejected += 1
+            raise Overloaded()
+        self.queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        self.running += 1
+        try:
+            yield
+            self.served += 1
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.running -= 1
+            self._slots.release()
+
+    async def ask(self, question, model_name, max_tries, num_candidates, selection):
+        from async_pipeline import process_prompt_async
+        async with self.admitted():
+            return await process_prompt_async(self.driver, question, max_tries, model_name, num_candidates, selection)
+
+    async def ask_stream(self, put, question, model_name, max_tries, num_candidates, selection):
+        from async_pipeline import stream_prompt_async
+        async with self.admitted():
+            put(("start", None))
+            async for event in stream_prompt_async(self.driver, question, max_tries, model_name, num_candidates, selection):
+                put(("event", event))
+
+    def arguments(self, request):
+        """The process_prompt_async arguments of an /ask body; raises ValueError for anything out of range."""
+        question, model_name = request.get("question"), request.get("model", self.config["SERVICE_MODEL"])
+        if not isinstance(question, str) or not question.strip():
+            raise ValueError("expected a JSON object with a non-empty 'question'")
+        if not isinstance(model_name, str):
+            raise ValueError("'model' must be a string")
+        max_tries = bounded_integer(request, "max_tries", self.config["SERVICE_MAX_TRIES"], self.config["SERVICE_MAX_TRIES"])
+        num_candidates = bounded_integer(request, "candidates", 1, self.config["SERVICE_MAX_CANDIDATES"])
+        selection = request.get("selection", "first")
+        if selection not in ("first", "best"):
+            raise ValueError("'selection' must be 'first' or 'best'")
+        return question, model_name, max_tries, num_candidates, selection
+
+    def submit_stream(self, arguments, put):
+        """Start a streamed /ask request; put() receives ("start", None) once admitted, ("event", event)s and finally ("end", error or None)."""
+        future = asyncio.run_coroutine_threadsafe(self.ask_stream(put, *arguments), self.loop)
+        future.add_done_callback(lambda done: put(("end", None if done.cancelled() else done.exception())))
+        return future
+
+    def submit(self, arguments):
+        """Run one /ask request from a handler thread; returns the pipeline output or raises."""
+        future = asyncio.run_coroutine_threadsafe(self.ask(*arguments), self.loop)
+        try:
+            return future.result(timeout=self.config["SERVICE_REQUEST_TIMEOUT"])
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def stats(self):
+        from query_cache import cache_stats
+        from intent_templates import template_stats
+        return {
+            "ready": self.is_ready(), "running": self.running, "queued": self.queued, "served": self.served,
+            "rejected": self.rejected, "failed": self.failed, **cache_stats(), "templates": template_stats(),
+        }
+
+    def stop(self, drain_timeout=30.0):
+        """Stop admitting questions, let the running ones finish, then close the driver and clients."""
+        self.draining = True
+        asyncio.run_coroutine_threadsafe(self._close(drain_timeout), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    async def _close(self, drain_timeout):
+        from llm_clients import aclose_llm_clients, close_llm_clients
+        waited = 0.0
+        while (self.running or self.queued) and waited < drain_timeout:
+            await asyncio.sleep(0.1)
+            waited += 0.1
+        if self.driver is not None:
+            await self.driver.close()
+        await aclose_llm_clients()
+        close_llm_clients()
+
+
+def bounded_integer(request, key, default, upper):
+    value = request.get(key, default)
+    if not isinstance(value, int) or isinstance(value, bool) or not 1 <= value <= upper:
+        raise ValueError(f"'{key}' must be an integer from 1 to {upper}")
+    return value
+
+
+def make_handler(service):
+    class QuestionHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if self.path == "/healthz":
+                self.send_json(200, {"status": "ok"})
+            elif self.path == "/readyz":
+                if service.is_ready():
+                    self.send_json(200, {"status": "ready"})
+                else:
+                    status = "draining" if service.draining else "failed" if service.warmup_error else "warming up"
+                    self.send_json(503, {"status": status, "error": service.warmup_error})
+            elif self.path == "/stats":
+                self.send_json(200, service.stats())
+            elif self.path == "/metrics":
+                from tracing import metrics
+                self.send_body(200, metrics.text().encode(), "text/plain; version=0.0.4")
+            else:
+                self.send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/ask":
+                self.send_json(404, {"error": "not found"})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > service.config["SERVICE_MAX_BODY_BYTES"]:
+                self.close_connection = True
+                self.send_json(413, {"error": "request body too large"})
+                return
+            try:
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(request, dict):
+                    raise ValueError("expected a JSON object with a non-empty 'question'")
+                arguments = service.arguments(request)
+            except ValueError as e:
+                self.send_json(400, {"error": str(e)})
+                return
+            if request.get("stream"):
+                self.stream_answer(arguments)
+                return
+            try:
+                self.send_json(200, service.submit(arguments))
+            except Exception as e:
+                self.send_failure(e)
+
+        def stream_answer(self, arguments):
+            events = queue.Queue()
+            future = service.submit_stream(arguments, events.put)
+            deadline = time.monotonic() + service.config["SERVICE_REQUEST_TIMEOUT"]
+            started = False
+            try:
+                while True:
+                    try:
+                        kind, value = events.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        future.cancel()
+                        kind, value = "end", concurrent.futures.TimeoutError()
+                    if kind == "start":
+                        started = True
+                        self.send_response(200)
+                        self.send_header("Content-Type", "application/x-ndjson")
+                        self.send_header("Transfer-Encoding", "chunked")
+                        self.end_headers()
+                    elif kind == "event":
+                        self.send_chunk(value)
+                    else:
+                        if not started:
+                            self.send_failure(value)
+                            return
+                        if value is not None:
+                            self.send_chunk({"type": "error", "error": "question timed out" if isinstance(value, concurrent.futures.TimeoutError) else repr(value)})
+                        self.wfile.write(b"0\r\n\r\n")
+                        return
+            except OSError:
+                # The client went away; stop working on its question.
+                future.cancel()
+                self.close_connection = True
+
+        def send_chunk(self, event):
+            line = json.dumps(event, default=str).encode() + b"\n"
+            self.wfile.write(f"{len(line):X}\r\n".encode() + line + b"\r\n")
+            self.wfile.flush()
+
+        def send_failure(self, error):
+            if isinstance(error, Overloaded):
+                self.send_json(429, {"error": "too many questions in flight, retry later"}, {"Retry-After": "1"})
+            elif isinstance(error, NotReady):
+                self.send_json(503, {"error": "service is not ready"}, {"Retry-After": "5"})
+            elif isinstance(error, concurrent.futures.TimeoutError):
+                self.send_json(504, {"error": "question timed out"})
+            else:
+                self.send_json(500, {"error": repr(error)})
+
+        def send_json(self, status, payload, headers=None):
+            self.send_body(status, json.dumps(payload, default=str).encode(), "application/json", headers)
+
+        def send_body(self, status, body, content_type, headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return QuestionHandler
+
+
+def serve(config=None, driver=None):
+    config = config if config is not None else service_config
+    service = QuestionService(config, driver)
+    server = ThreadingHTTPServer((config["SERVICE_HOST"], config["SERVICE_PORT"]), make_handler(service))
+    server.daemon_threads = True
+    service.start()
+
+    def shut_down(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, shut_down)
+    print(f"Listening on http://{config['SERVICE_HOST']}:{config['SERVICE_PORT']}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+if __name__ == '__main__':
+    serve()
@@ -0,0 +1,121 @@
+import argparse, json, os, random
+
+# Synthetic graph with the sample schema from create_db.py (Sector, Company, RawMaterials, Policy,
+# Regulation, Agency, Country, Mine and their relationships), scaled by the number of companies.
+# Every other label grows with the company count, so a run at 1M companies has ~1M nodes and ~5M
+# relationships with realistic fan-out (hub materials and sectors). Rows use the bulk_loader.py
+# formats, so `python synthetic_graph.py --companies 1000000 --out-dir data/synthetic` followed by
+# `python bulk_loader.py --nodes data/synthetic/nodes.jsonl --edges data/synthetic/edges.jsonl`
+# loads it into Neo4j; benchmark.py also loads the rows straight into its in-process graph.
+# The output is a pure function of (companies, seed).
+
+SECTORS = ["Automotive", "Mobile Phones", "Software", "Semiconductors", "Energy", "Pharmaceuticals", "Aerospace", "Consumer Electronics"]
+RAW_MATERIALS = ["Lithium", "Aluminum", "Copper", "Silicon/Chips", "Nickel", "Cobalt", "Steel", "Rare Earths"]
+POLICIES = ["Trump Tariff", "Steel Tariff"]
+REGULATIONS = ["Pollution Norms", "Safety Standards for Vehicles"]
+AGENCIES = ["Department of Commerce", "Environmental Protection Agency (EPA)", "National Highway Traffic Safety Administration (NHTSA)"]
+COUNTRIES = [
+    "USA", "Australia", "Canada", "China", "Chile", "Ukraine", "Taiwan", "Japan", "India", "Germany", "Finland",
+    "South Korea", "UK", "Brazil", "Peru", "Indonesia", "Congo", "Argentina", "Bolivia", "Russia", "Mexico",
+    "South Africa", "Zambia", "Philippines", "Vietnam", "France", "Sweden", "Norway", "Poland", "Turkey",
+]
+
+
+def names(base, count, prefix):
+    """The base names first, then numbered ones ('Material 9') up to count."""
+    return base[:count] + [f"{prefix} {index}" for index in range(len(base), count)]
+
+
+def graph_sizes(companies):
+    return {
+        "Company": companies,
+        "Sector": max(len(SECTORS), companies // 1000),
+        "RawMaterials": max(len(RAW_MATERIALS), companies // 500),
+        "Policy": max(len(POLICIES), companies // 5000),
+        "Regulation": max(len(REGULATIONS), companies // 5000),
+        "Agency": max(len(AGENCIES), companies // 20000),
+        "Country": max(len(COUNTRIES), min(250, companies // 2000)),
+    }
+
+
+def mine_name(material):
+    return material.split("/")[0] + " Mine"
+
+
+def entity_names(companies):
+    """Names per label for a graph of this size."""
+    sizes = graph_sizes(companies)
+    materials = names(RAW_MATERIALS, sizes["RawMaterials"], "Material")
+    return {
+        "Sector": names(SECTORS, sizes["Sector"], "Sector"),
+        "Company": [f"Company {index}" for index in range(companies)],
+        "RawMaterials": materials,
+        "Policy": names(POLICIES, sizes["Policy"], "Policy"),
+        "Regulation": names(REGULATIONS, sizes["Regulation"], "Regulation"),
+        "Agency": names(AGENCIES, sizes["Agency"], "Agency"),
+        "Country": names(COUNTRIES, sizes["Country"], "Country"),
+        "Mine": [mine_name(material) for material in materials],
+    }
+
+
+def synthetic_nodes(companies, seed=0):
+    rng = random.Random(seed)
+    entities = entity_names(companies)
+    countries = entities["Country"]
+    for label, label_names in entities.items():
+        for name in label_names:
+            row = {"label": label, "name": name}
+            if label == "Company":
+                row["nationality"] = rng.choice(countries)
+            yield row
+
+
+def synthetic_edges(companies, seed=0):
+    rng = random.Random(seed + 1)
+    entities = entity_names(companies)
+
+    def edge(start_label, start, rel_type, end_label, end):
+        return {"start_label": start_label, "start": start, "type": rel_type, "end_label": end_label, "end": end}
+
+    for company in entities["Company"]:
+        yield edge("Sector", rng.choice(entities["Sector"]), "HAS_COMPANY", "Company", company)
+        for material in rng.sample(entities["RawMaterials"], 2):
+            yield edge("Company", company, "IMPACTED_BY", "RawMaterials", material)
+        if rng.random() < 0.5:
+            yield edge("Company", company, "IMPACTED_BY", "Policy", rng.choice(entities["Policy"]))
+        if rng.random() < 0.5:
+            yield edge("Company", company, "IMPACTED_BY", "Regulation", rng.choice(entities["Regulation"]))
+        for country in rng.sample(entities["Country"], rng.randint(1, 2)):
+            yield edge("Company", company, "SOURCES_FROM", "Country", country)
+        if rng.random() < 0.1:
+            yield edge("Company", company, "SUPPLIES", "RawMaterials", rng.choice(entities["RawMaterials"]))
+    for mine in entities["Mine"]:
+        for country in rng.sample(entities["Country"], rng.randint(2, 4)):
+            yield edge("Country", country, "POSSESSED_BY", "Mine", mine)
+    for agency in entities["Agency"]:
+        yield edge("Agency", agency, "ENFORCES", "Policy", rng.choice(entities["Policy"]))
+        yield edge("Agency", agency, "ENFORCES", "Regulation", rng.choice(entities["Regulation"]))
+
+
+def write_jsonl(rows, path):
+    count = 0
+    with open(path, "w") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+            count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic graph in the bulk_loader.py JSONL formats.")
+    parser.add_argument("--companies", type=int, default=10000, help="number of Company nodes; every other label scales with it")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out-dir", default="data/synthetic")
+    args = parser.parse_args()
+    os.makedirs(args.out_dir, exist_ok=True)
+    nodes = write_jsonl(synthetic_nodes(args.companies, args.seed), os.path.join(args.out_dir, "nodes.jsonl"))
+    edges = write_jsonl(synthetic_edges(args.companies, args.seed), os.path.join(args.out_dir, "edges.jsonl"))
+    print(f"Wrote {nodes} nodes and {edges} edges to {args.out_dir}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import pytest
+from schema_cache import build_schema_rows
+from cypher_validator import validate_cypher
+
+SCHEMA = build_schema_rows(
+    {"Company": {"name", "nationality"}, "RawMaterials": {"name"}, "Sector": {"name"}},
+    {"SUPPLIES": {"since"}},
+    [
+        ("Sector", "HAS_COMPANY", "Company"),
+        ("Company", "IMPACTED_BY", "RawMaterials"),
+        ("Company", "SUPPLIES", "RawMaterials"),
+    ],
+)
+
+
+def codes(query):
+    return [error["code"] for error in validate_cypher(query, SCHEMA)]
+
+
+@pytest.mark.parametrize("query", [
+    "MATCH (c:Company)-[:IMPACTED_BY]->(m:RawMaterials {name: 'Lithium'}) RETURN c.name",
+    "MATCH (c:Company)-[r:SUPPLIES]->(m:RawMaterials) WHERE r.since > 2020 RETURN c.name",
+    "MATCH (c:Company) RETURN c {.name, .nationality}",
+    "MATCH (c:Company|Sector) RETURN c.name",
+    "MATCH (c:!RawMaterials) RETURN c.name",
+    "MATCH (c:Company) RETURN c.name AS set",
+    "MATCH (c:Company) RETURN c.name AS set ORDER BY set DESC",
+    "MATCH (c:Company) WITH c.name AS delete RETURN delete",
+    "UNWIND ['a', 'b'] AS remove RETURN remove",
+    "MATCH (set:Company) RETURN set.name",
+    "MATCH (c:Company) RETURN c.name // SET c.name = 'x'",
+    "MATCH (c:Company) WHERE c.name = 'CREATE' RETURN c.name",
+    "MATCH (c:Company) RETURN count(c) AS companies",
+])
+def test_valid_read_queries(query):
+    assert codes(query) == []
+
+
+@pytest.mark.parametrize("query, write", [
+    ("MATCH (c:Company) SET c.name = 'x'", "SET"),
+    ("CREATE (c:Company {name: 'x'})", "CREATE"),
+    ("MERGE (c:Company {name: 'x'}) RETURN c", "MERGE"),
+    ("MATCH (c:Company) DETACH DELETE c", "DELETE"),
+    ("MATCH (c:Company) REMOVE c.nationality", "REMOVE"),
+    ("MATCH (c:Company) WITH c AS delete DETACH DELETE delete", "DELETE"),
+    ("MATCH (set:Company) set set.name = 'x'", "SET"),
+    ("CALL db.createLabel('X')", "db.createLabel"),
+    ("MATCH (c:Company) CALL { WITH c DELETE c } IN TRANSACTIONS", "IN TRANSACTIONS"),
+])
+def test_write_clauses_are_rejected(query, write):
+    errors = validate_cypher(query, SCHEMA)
+    assert any(error["code"] == "write_clause" and write in error["message"] for error in errors)
+
+
+def test_unknown_names_are_reported_with_suggestions():
+    errors = validate_cypher("MATCH (c:Compny)-[:SUPPLY]->(m:RawMaterials) RETURN c.nam", SCHEMA)
+    assert [error["code"] for error in errors] == ["unknown_label", "unknown_relationship_type", "unknown_property"]
+    assert "'Company'" in errors[0]["message"]
+    assert "'SUPPLIES'" in errors[1]["message"]
+    assert "'name'" in errors[2]["message"]
+
+
+@pytest.mark.parametrize("query, code", [
+    ("", "empty_query"),
+    ("MATCH (c:Company RETURN c.name", "unbalanced_brackets"),
+])
+def test_malformed_queries(query, code):
+    assert codes(query) == [code]
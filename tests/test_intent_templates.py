@@ -0,0 +1,81 @@
+import pytest
+from schema_cache import build_schema_rows
+from entity_linker import EntityIndex, schema_words
+from intent_templates import match_intent
+
+SCHEMA = build_schema_rows(
+    {
+        "Company": {"name", "nationality"}, "Sector": {"name"}, "RawMaterials": {"name"},
+        "Policy": {"name"}, "Country": {"name"}, "Mine": {"name"},
+    },
+    {"SUPPLIES": {"since"}},
+    [
+        ("Sector", "HAS_COMPANY", "Company"),
+        ("Company", "IMPACTED_BY", "RawMaterials"),
+        ("Company", "IMPACTED_BY", "Policy"),
+        ("Company", "SUPPLIES", "RawMaterials"),
+        ("Company", "SOURCES_FROM", "Country"),
+        ("Country", "POSSESSED_BY", "Mine"),
+    ],
+)
+
+INDEX = EntityIndex(fuzzy_threshold=0.8)
+INDEX.update([
+    ("RawMaterials", "Lithium"), ("RawMaterials", "Silicon/Chips"), ("Policy", "Trump Tariff"),
+    ("Sector", "Automotive"), ("Sector", "Sector 9"), ("Country", "China"), ("Mine", "Lithium Mine"),
+    ("Company", "Tesla"),
+])
+
+
+def match(prompt):
+    return match_intent(prompt, SCHEMA, INDEX.link(prompt, schema_words(SCHEMA)))
+
+
+@pytest.mark.parametrize("prompt, intent, name", [
+    ("Which companies are impacted by lithium?", "impacted_by", "Lithium"),
+    ("Which firms are affected by the Trump Tariff?", "impacted_by", "Trump Tariff"),
+    ("Who supplies silicon?", "supplies", "Silicon/Chips"),
+    ("Which countries have mines for lithium?", "countries_with_mines", "Lithium"),
+    ("List companies in the automotive sector", "sector_companies", "Automotive"),
+])
+def test_template_hits(prompt, intent, name):
+    result = match(prompt)
+    assert result is not None
+    assert result["template"]["intent"] == intent
+    assert result["name"] == name
+    assert result["params"]["name"] == name
+
+
+def test_mine_template_matches_mines_by_prefix():
+    result = match("Which countries have mines for lithium?")
+    assert result["params"] == {"name": "Lithium", "prefix": "Lithium "}
+
+
+@pytest.mark.parametrize("prompt", [
+    "How many companies are impacted by lithium?",  # counting
+    "Which companies are not impacted by lithium?",  # negation
+    "Which Indian companies are impacted by lithium?",  # qualifier the template can't express
+    "Which companies in automotive are impacted by lithium?",  # second relationship
+    "Which companies are impacted by lithium and headquartered abroad?",  # second condition
+])
+def test_blocking_and_qualifier_words_fall_back(prompt):
+    assert match(prompt) is None
+
+
+def test_two_linked_entities_fall_back():
+    assert match("Which companies are impacted by lithium and the Trump Tariff?") is None
+
+
+def test_fuzzy_link_falls_back():
+    links = INDEX.link("Which companies are impacted by lithiumm?", schema_words(SCHEMA))
+    assert [link["score"] < 1.0 for link in links] == [True]
+    assert match_intent("Which companies are impacted by lithiumm?", SCHEMA, links) is None
+
+
+def test_schema_words_are_not_fuzzy_linked():
+    # 'sector' names the label; it must not link to the entity 'Sector 9'.
+    assert INDEX.link("Which companies are in each sector?", schema_words(SCHEMA)) == []
+
+
+def test_entity_outside_template_labels_falls_back():
+    assert match("Which companies are impacted by China?") is None
@@ -0,0 +1,299 @@
+import atexit, contextvars, functools, inspect, json, os, sys, threading, time, uuid
+from dotenv import load_dotenv
+
+env_path = 'knowledgegraph/neo4j_creds.env'
+load_dotenv(dotenv_path=env_path)
+
+# Per-stage tracing for the question pipeline. Functions decorated with @traced run inside a span
+# that records its duration, parent span and attributes (retries, token counts, row counts, Neo4j
+# server timings); a finished span is written as one JSON line to TRACE_LOG_PATH (stderr if unset)
+# and folded into Prometheus-style metrics, which can be written to METRICS_PATH and/or served on
+# METRICS_PORT at /metrics. Token and row counts roll up from child spans into their parents, so
+# a process_prompt span carries the totals for the whole question. With TRACING_ENABLED=false
+# (the default) @traced calls the function directly and current_span() is a shared no-op.
+
+tracing_config = {
+    "TRACING_ENABLED": os.getenv("TRACING_ENABLED", "false").lower() == "true",
+    "TRACE_LOG_PATH": os.getenv("TRACE_LOG_PATH"),
+    "METRICS_PATH": os.getenv("METRICS_PATH"),
+    "METRICS_PORT": int(os.getenv("METRICS_PORT", "0")),
+}
+
+# Attributes summed into the parent span when a child span ends.
+ROLLUP_KEYS = ("llm_calls", "prompt_tokens", "completion_tokens", "rows")
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current = contextvars.ContextVar("current_span", default=None)
+
+
+class NoopSpan:
+    def set(self, key, value):
+        pass
+
+    def add(self, key, amount=1):
+        pass
+
+
+NOOP_SPAN = NoopSpan()
+
+
+class Span:
+    def __init__(self, name, parent):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:8]
+        self.attributes = {}
+        self.error = None
+        self.started = time.perf_counter()
+        self.start_time = time.time()
+        self.duration = None
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def add(self, key, amount=1):
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def record(self):
+        record = {
+            "trace_id": self.trace_id, "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "name": self.name, "start": round(self.start_time, 6), "duration_ms": round(self.duration * 1000, 3),
+            **self.attributes,
+        }
+        if self.error:
+            record["error"] = self.error
+        return record
+
+
+class Metrics:
+    """Thread-safe counters and duration histograms rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}  # (metric, labels) -> value
+        self.histograms = {}  # (metric, labels) -> [bucket counts..., sum, count]
+
+    def inc(self, metric, amount=1, **labels):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, metric, value, **labels):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.setdefault(key, [0] * len(DURATION_BUCKETS) + [0.0, 0])
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if value <= bound:
+                    histogram[index] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def text(self):
+        def render(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}" if pairs else ""
+
+        lines = []
+        with self._lock:
+            for metric in sorted({metric for metric, labels in self.counters}):
+                lines.append(f"# TYPE {metric} counter")
+                for (name, labels), value in sorted(self.counters.items()):
+                    if name == metric:
+                        lines.append(f"{metric}{render(labels)} {value}")
+            for metric in sorted({metric for metric, labels in self.histograms}):
+                lines.append(f"# TYPE {metric} histogram")
+                for (name, labels), histogram in sorted(self.histograms.items()):
+                    if name != metric:
+                        continue
+                    for bound, count in zip(DURATION_BUCKETS, histogram):
+                        lines.append(f"{metric}_bucket{render(labels, [('le', bound)])} {count}")
+                    lines.append(f"{metric}_bucket{render(labels, [('le', '+Inf')])} {histogram[-1]}")
+                    lines.append(f"{metric}_sum{render(labels)} {round(histogram[-2], 6)}")
+                    lines.append(f"{metric}_count{render(labels)} {histogram[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+_log_lock = threading.Lock()
+_log_file = None
+
+
+def current_span():
+    span = _current.get()
+    return span if span is not None else NOOP_SPAN
+
+
+def start_span(name):
+    span = Span(name, _current.get())
+    return span, _current.set(span)
+
+
+def end_span(span, token, error=None):
+    span.duration = time.perf_counter() - span.started
+    if error is not None:
+        span.error = repr(error)
+    _current.reset(token)
+    if span.parent is not None:
+        for key in ROLLUP_KEYS:
+            if key in span.attributes:
+                span.parent.add(key, span.attributes[key])
+    export(span)
+
+
+def export(span):
+    global _log_file
+    line = json.dumps(span.record(), default=str)
+    with _log_lock:
+        if _log_file is None:
+            path = tracing_config["TRACE_LOG_PATH"]
+            _log_file = open(path, "a") if path else sys.stderr
+        _log_file.write(line + "\n")
+        _log_file.flush()
+    metrics.observe("kg_stage_duration_seconds", span.duration, stage=span.name)
+    if span.error:
+        metrics.inc("kg_stage_errors_total", stage=span.name)
+    attributes = span.attributes
+    if span.parent is None:
+        # Rolled-up totals are counted once, on the root span.
+        for key in ("prompt_tokens", "completion_tokens"):
+            if key in attributes:
+                metrics.inc("kg_llm_tokens_total", attributes[key], kind=key.split("_")[0])
+        if "llm_calls" in attributes:
+            metrics.inc("kg_llm_calls_total", attributes["llm_calls"])
+        if "rows" in attributes:
+            metrics.inc("kg_query_rows_total", attributes["rows"])
+    if "retries" in attributes:
+        metrics.inc("kg_generation_retries_total", attributes["retries"], stage=span.name)
+    for key in ("result_available_after", "result_consumed_after"):
+        if attributes.get(key) is not None:
+            metrics.observe(f"kg_neo4j_{key}_seconds", attributes[key] / 1000, stage=span.name)
+
+
+def traced(name):
+    """Run the decorated function (sync or async) inside a span called name."""
+    def decorate(function):
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                if not tracing_config["TRACING_ENABLED"]:
+                    return await function(*args, **kwargs)
+                span, token = start_span(name)
+                try:
+                    result = await function(*args, **kwargs)
+                except BaseException as e:
+                    end_span(span, token, e)
+                    raise
+                end_span(span, token)
+                return result
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not tracing_config["TRACING_ENABLED"]:
+                return function(*args, **kwargs)
+            span, token = start_span(name)
+            try:
+                result = function(*args, **kwargs)
+            except BaseException as e:
+                end_span(span, token, e)
+                raise
+            end_span(span, token)
+            return result
+        return wrapper
+    return decorate
+
+
+class stage_span:
+    """Context manager form of @traced, for stages that aren't a function of their own."""
+
+    def __init__(self, name):
+        self.name = name
+        self.span = None
+
+    def __enter__(self):
+        if not tracing_config["TRACING_ENABLED"]:
+            return NOOP_SPAN
+        self.span, self.token = start_span(self.name)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.span is not None:
+            end_span(self.span, self.token, exc)
+        return False
+
+
+def record_llm_usage(usage):
+    """Attach prompt/completion token counts from an SDK response's usage to the current span."""
+    span = current_span()
+    if usage is None or span is NOOP_SPAN:
+        return
+    span.add("prompt_tokens", getattr(usage, "prompt_tokens", 0) or 0)
+    span.add("completion_tokens", getattr(usage, "completion_tokens", 0) or 0)
+
+
+def record_llm_call(model_name, messages, output):
+    """Count an LLM call on the current span, estimating tokens locally when the backend reported no usage."""
+    span = current_span()
+    if span is NOOP_SPAN:
+        return
+    span.set("model", model_name)
+    span.add("llm_calls")
+    if "prompt_tokens" not in span.attributes:
+        from prompt_context import count_tokens
+        span.add("prompt_tokens", sum(count_tokens(message["content"]) for message in messages))
+        span.add("completion_tokens", count_tokens(output or ""))
+        span.set("tokens_estimated", True)
+
+
+def record_execution(execution, cache_hit=False):
+    """Row count, truncation and Neo4j server timings of a run_query execution on the current span."""
+    span = current_span()
+    span.add("rows", len(execution["rows"]))
+    span.set("cache_hit", cache_hit)
+    span.set("truncated", execution["truncated"])
+    if not cache_hit:
+        span.set("result_available_after", execution.get("result_available_after"))
+        span.set("result_consumed_after", execution.get("result_consumed_after"))
+
+
+def write_metrics(path=None):
+    path = path or tracing_config["METRICS_PATH"]
+    if not path:
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(metrics.text())
+    os.replace(tmp_path, path)
+
+
+atexit.register(lambda: tracing_config["TRACING_ENABLED"] and write_metrics())
+
+
+def start_metrics_server(port=None):
+    """Serve the metrics at http://localhost:port/metrics from a daemon thread; no-op without a port or with tracing off."""
+    port = port or tracing_config["METRICS_PORT"]
+    if not port or not tracing_config["TRACING_ENABLED"]:
+        return None
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server